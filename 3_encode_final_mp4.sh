@@ -2,9 +2,10 @@
 INPUT="$1"
 CODEC="${2:-h264}"  # default to h264 if not specified
 OUTFOLDER="$3"
+SOURCE="${4:-folder}"  # "pipe" = read PNG frames from stdin instead of interpolated/
 
 if [ -z "$INPUT" ]; then
-  echo "❌ Usage: $0 input.suffix [h264|h265] [optional_output_folder]"
+  echo "❌ Usage: $0 input.suffix [h264|h265] [optional_output_folder] [folder|pipe]"
   exit 1
 fi
 
@@ -16,13 +17,19 @@ cd "$WORKDIR" || exit 1
 
 FRAMERATE=50
 
+if [ "$SOURCE" == "pipe" ]; then
+  FRAMES_INPUT=(-f image2pipe -framerate $FRAMERATE -i -)
+else
+  FRAMES_INPUT=(-framerate $FRAMERATE -pattern_type glob -i "interpolated/*.png")
+fi
+
 if [ "$CODEC" == "h264" ]; then
   echo "[Encoding to H.264 with NVENC...]"
-  ffmpeg -framerate $FRAMERATE -pattern_type glob -i "interpolated/*.png" \
+  ffmpeg "${FRAMES_INPUT[@]}" \
     -vf "tblend=all_mode=average,framestep=2" -r 25 -c:v h264_nvenc -pix_fmt yuv420p "tmp_${STEM}_upscaled.mp4"
 elif [ "$CODEC" == "h265" ]; then
   echo "[Encoding to H.265 with NVENC...]"
-  ffmpeg -framerate $FRAMERATE -pattern_type glob -i "interpolated/*.png" \
+  ffmpeg "${FRAMES_INPUT[@]}" \
     -c:v hevc_nvenc -preset p4 -rc vbr -cq 23 -b:v 0 -pix_fmt yuv420p -movflags +faststart "tmp_${STEM}_upscaled.mp4"
 else
   echo "❌ Invalid codec: $CODEC. Use 'h264' or 'h265'."
@@ -30,7 +37,7 @@ else
 fi
 
 # === [2] Add audio ===
-ffmpeg -i "tmp_${STEM}_upscaled.mp4" -i preprocessed/clean.mp4 -c copy -map 0:v:0 -map 1:a:0? "${STEM}_upscaled.mp4"
+ffmpeg -nostdin -i "tmp_${STEM}_upscaled.mp4" -i preprocessed/clean.mp4 -c copy -map 0:v:0 -map 1:a:0? "${STEM}_upscaled.mp4"
 rm tmp_${STEM}_upscaled.mp4
 
 # === [3] Move to output folder if specified ===
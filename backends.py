@@ -0,0 +1,211 @@
+"""
+Upscale / interpolate backends.
+
+A backend takes a folder of PNG frames and writes results into an output folder:
+    upscale(input_dir, output_dir, frames=None)   # frames: optional subset
+    interpolate(input_dir, output_dir)             # writes %08d.png, 2 per input frame
+
+NcnnBackend wraps waifu2x-ncnn-vulkan / rife-ncnn-vulkan (gpu -1 = ncnn on CPU).
+CpuBackend shards frames over a process pool with Pillow resampling and linear
+blending, for idle CPU cores or GPU-less machines. It does not denoise.
+
+Backends are configured in SETTINGS["upscale_backends"] and
+SETTINGS["interpolate_backend"]; frames are shared between several upscale
+backends by their "share" weight.
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+from settings import SETTINGS
+
+
+def _run(cmd):
+    print(f"▶️ Running: {' '.join(cmd)}")
+    subprocess.run(cmd, check=True)
+
+
+class NcnnBackend:
+    def __init__(self, gpu=None, threads=None, tile=None, share=1, run=_run):
+        self.gpu = SETTINGS["primary_gpu"] if gpu is None else gpu
+        self.threads = threads or SETTINGS["threads"]
+        self.tile = tile
+        self.share = share
+        self.run = run
+
+    def __repr__(self):
+        return f"NcnnBackend(gpu={self.gpu})"
+
+    def upscale(self, input_dir, output_dir, frames=None):
+        if frames is None:
+            self.run(self.upscale_command(input_dir, output_dir))
+            return
+        # waifu2x only takes a file or a folder, so link the subset into one
+        with tempfile.TemporaryDirectory(dir=Path(output_dir).parent) as td:
+            for frame in frames:
+                os.symlink(os.path.abspath(frame), Path(td, Path(frame).name))
+            self.run(self.upscale_command(td, output_dir))
+
+    def upscale_command(self, input_dir, output_dir):
+        cmd = [
+            SETTINGS["waifu2x_path"],
+            "-i",
+            str(input_dir),
+            "-o",
+            str(output_dir),
+            "-n",
+            str(SETTINGS["noise"]),
+            "-s",
+            str(SETTINGS["scale"]),
+            "-m",
+            SETTINGS["waifu_model"],
+            "-g",
+            str(self.gpu),
+            "-j",
+            str(self.threads),
+        ]
+        if self.tile is not None:
+            cmd += ["-t", str(self.tile)]
+        return cmd
+
+    def interpolate(self, input_dir, output_dir):
+        self.run(self.interpolate_command(input_dir, output_dir))
+
+    def interpolate_command(self, input_dir, output_dir):
+        return [
+            SETTINGS["rife_path"],
+            "-i",
+            str(input_dir),
+            "-o",
+            str(output_dir),
+            "-m",
+            SETTINGS.get("rife_model", "rife-anime"),
+            "-g",
+            str(self.gpu),
+            "-j",
+            str(self.threads),
+        ]
+
+
+# --- CPU backend (pool workers must be top-level functions to pickle)
+def _resize_frame(frame, output_dir, scale):
+    from PIL import Image
+
+    with Image.open(frame) as im:
+        im = im.convert("RGB")
+        im = im.resize((im.width * scale, im.height * scale), Image.LANCZOS)
+        im.save(Path(output_dir, Path(frame).name), compress_level=1)
+
+
+def _interpolate_pair(frame0, frame1, index, output_dir):
+    from PIL import Image
+
+    with Image.open(frame0) as im0:
+        im0 = im0.convert("RGB")
+        im0.save(Path(output_dir, f"{2 * index + 1:08d}.png"), compress_level=1)
+        if frame1 is None:
+            mid = im0  # last frame is held, like rife's N*2 output
+        else:
+            with Image.open(frame1) as im1:
+                mid = Image.blend(im0, im1.convert("RGB"), 0.5)
+        mid.save(Path(output_dir, f"{2 * index + 2:08d}.png"), compress_level=1)
+
+
+class CpuBackend:
+    def __init__(self, workers=None, share=1, scale=None):
+        self.workers = workers or os.cpu_count()
+        self.share = share
+        self.scale = scale or SETTINGS["scale"]
+
+    def __repr__(self):
+        return f"CpuBackend(workers={self.workers})"
+
+    def upscale(self, input_dir, output_dir, frames=None):
+        if frames is None:
+            frames = sorted(Path(input_dir).glob("*.png"))
+        print(f"▶️ CPU upscaling {len(frames)} frames on {self.workers} processes")
+        with ProcessPoolExecutor(self.workers) as pool:
+            list(
+                pool.map(
+                    _resize_frame,
+                    frames,
+                    repeat(output_dir),
+                    repeat(self.scale),
+                    chunksize=8,
+                )
+            )
+
+    def interpolate(self, input_dir, output_dir):
+        frames = sorted(Path(input_dir).glob("*.png"))
+        print(f"▶️ CPU interpolating {len(frames)} frames on {self.workers} processes")
+        with ProcessPoolExecutor(self.workers) as pool:
+            list(
+                pool.map(
+                    _interpolate_pair,
+                    frames,
+                    frames[1:] + [None],
+                    range(len(frames)),
+                    repeat(output_dir),
+                    chunksize=8,
+                )
+            )
+
+
+def make_backend(spec, threads=None, tile=None, run=_run):
+    kind = spec.get("type", "ncnn")
+    if kind == "ncnn":
+        return NcnnBackend(
+            gpu=spec.get("gpu"),
+            threads=spec.get("threads", threads),
+            tile=spec.get("tile", tile),
+            share=spec.get("share", 1),
+            run=run,
+        )
+    if kind == "cpu":
+        return CpuBackend(workers=spec.get("workers"), share=spec.get("share", 1))
+    raise ValueError(f"Unknown backend type: {kind}")
+
+
+def split_by_share(frames, backends):
+    """Contiguous slices of `frames`, sized by each backend's share."""
+    total = sum(b.share for b in backends)
+    shards, start, acc = [], 0, 0
+    for b in backends:
+        acc += b.share
+        end = round(len(frames) * acc / total)
+        shards.append(frames[start:end])
+        start = end
+    return shards
+
+
+def upscale_shared(backends, input_dir, output_dir):
+    """Upscale a folder, running all backends in parallel on their share of frames."""
+    if len(backends) == 1:
+        backends[0].upscale(input_dir, output_dir)
+        return
+
+    frames = sorted(Path(input_dir).glob("*.png"))
+    errors = []
+
+    def work(backend, shard):
+        try:
+            if shard:
+                backend.upscale(input_dir, output_dir, shard)
+        except Exception as e:
+            errors.append(f"{backend}: {e}")
+
+    threads = [
+        threading.Thread(target=work, args=(b, shard))
+        for b, shard in zip(backends, split_by_share(frames, backends))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise RuntimeError("Upscale backend failed: " + "; ".join(errors))
@@ -9,8 +9,20 @@ from settings import SETTINGS
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 import tempfile
-
-from util.estimate_png_frames_size import plan_chunks_for_shm
+import queue
+
+from util import throughput_db
+from util.resource_governor import run_governed
+from util.estimate_png_frames_size import _probe, plan_chunks_for_shm
+from util.part_manifest import (
+    count_video_packets,
+    frame_ranges,
+    load_manifest,
+    save_manifest,
+    sha256_file,
+    source_identity,
+    validate_part,
+)
 
 
 def load_progress():
@@ -32,34 +44,108 @@ def save_progress(progress):
         json.dump(progress, f, indent=2)
 
 
-def split_video(input_path, pieces, split_dir):
-    # Get duration
-    result = subprocess.run(
-        [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1",
-            str(input_path),
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True,
+def run_stage(cmd, stage):
+    """Run an external command under the stage's resource policy."""
+    return run_governed(
+        cmd,
+        stage,
+        SETTINGS.get("stage_resources"),
+        SETTINGS.get("resource_log"),
+        name=SETTINGS["file_name"],
     )
-    duration = float(result.stdout.strip())
-    piece_len = duration / pieces
 
+
+def part_output_path(part):
+    return Path(SETTINGS["final_output_folder"], f"{Path(part).stem}.mp4")
+
+
+def manifest_path(split_dir):
+    return Path(split_dir) / "manifest.json"
+
+
+ENCODE_INPUT_FPS = 50  # FRAMERATE in 3_encode_final_mp4.sh
+
+
+def expected_output_frames(source_frames):
+    # h264 encode blends interpolated pairs back to the source rate (framestep=2)
+    if SETTINGS["final_encoder"] == "h264":
+        return source_frames
+    return 2 * source_frames
+
+
+def expected_output_fps():
+    # The encoder reads interpolated frames at a fixed rate, whatever the
+    # source fps was; h264 halves it (framestep=2, -r 25)
+    if SETTINGS["final_encoder"] == "h264":
+        return ENCODE_INPUT_FPS / 2
+    return ENCODE_INPUT_FPS
+
+
+def split_video(input_path, pieces, split_dir):
+    """
+    Split into `pieces` parts on exact frame boundaries and record them in
+    splits/manifest.json. Parts from a previous run of the same source that
+    still match their checksum (or whose output already validated) are reused.
+    """
+    fps = _probe(str(input_path))["fps"]
+    total_frames = count_video_packets(input_path)
+    source = source_identity(str(input_path))
+
+    mpath = manifest_path(split_dir)
+    previous = load_manifest(mpath)
+    if previous and (
+        previous["source"] != source
+        or len(previous["parts"]) != pieces
+        or previous["final_encoder"] != SETTINGS["final_encoder"]
+    ):
+        previous = None
+
+    manifest = {
+        "source": source,
+        "fps": fps,
+        "total_frames": total_frames,
+        "final_encoder": SETTINGS["final_encoder"],
+        "parts": [],
+    }
     split_paths = []
 
-    for i in range(pieces):
+    for i, (start, end) in enumerate(frame_ranges(total_frames, pieces)):
         part_path = Path(split_dir) / f"input_part_{i+1:02d}.mp4"
-        start = i * piece_len
-        split_args = ["ffmpeg", "-y", "-ss", str(start), "-i", str(input_path)]
+        split_paths.append(str(part_path))
+        entry = {
+            "part": str(part_path),
+            "index": i,
+            "source_start_frame": start,
+            "source_end_frame": end,
+            "source_frames": end - start,
+            "expected_output_frames": expected_output_frames(end - start),
+            "expected_seconds": expected_output_frames(end - start)
+            / expected_output_fps(),
+            "split_sha256": None,
+            "output_sha256": None,
+            "validated": False,
+        }
+
+        old = previous["parts"][i] if previous else None
+        if old and old["source_start_frame"] == start:
+            split_ok = (
+                part_path.exists() and sha256_file(part_path) == old["split_sha256"]
+            )
+            if split_ok or old["validated"]:
+                print(f"♻️ Reusing split {part_path.name}")
+                old["expected_output_frames"] = entry["expected_output_frames"]
+                old["expected_seconds"] = entry["expected_seconds"]
+                manifest["parts"].append(old)
+                continue
+
+        # Accurate seek to half a frame before the first frame, so rounding
+        # of non-integer rates (30000/1001) can't drop it; exact frame count;
+        # -t also cuts the audio to the same length
+        seek = max(0.0, (start - 0.5) / fps)
+        split_args = ["ffmpeg", "-y", "-ss", f"{seek:.6f}", "-i", str(input_path)]
+        split_args += ["-frames:v", str(end - start)]
         if i < pieces - 1:
-            split_args += ["-t", str(piece_len)]
+            split_args += ["-t", f"{(end - start) / fps:.6f}"]
         # H.265 (HEVC) re-encode for clean, accurate split
         split_args += [
             "-c:v",
@@ -72,21 +158,102 @@ def split_video(input_path, pieces, split_dir):
             "23",
             str(part_path),
         ]
-        subprocess.run(split_args, check=True)
-        split_paths.append(str(part_path))
-
+        run_stage(split_args, "split")
+
+        split_frames = count_video_packets(part_path)
+        if split_frames != end - start:
+            raise RuntimeError(
+                f"Split {part_path.name} has {split_frames} frames, "
+                f"expected {end - start} (source frames {start}-{end})"
+            )
+        entry["split_sha256"] = sha256_file(part_path)
+        # An output left over from an older split must not pass validation
+        part_output_path(part_path).unlink(missing_ok=True)
+        manifest["parts"].append(entry)
+        save_manifest(mpath, manifest)
+
+    save_manifest(mpath, manifest)
     return split_paths
 
 
+def manifest_pieces(input_path, split_dir):
+    """
+    Part count of an existing manifest that split_video() would reuse, so a
+    rerun resumes it instead of replanning from the current free shm space.
+    """
+    manifest = load_manifest(manifest_path(split_dir))
+    if (
+        manifest
+        and manifest["source"] == source_identity(str(input_path))
+        and manifest["final_encoder"] == SETTINGS["final_encoder"]
+    ):
+        return len(manifest["parts"])
+    return None
+
+
+def manifest_outputs(manifest):
+    """Output paths of the manifest's parts, in join order."""
+    entries = sorted(manifest["parts"], key=lambda e: e["index"])
+    return [str(part_output_path(e["part"])) for e in entries]
+
+
+def validate_parts(manifest):
+    """Validate every part's output, update the manifest, return failing entries."""
+    invalid = []
+    for entry in manifest["parts"]:
+        output = part_output_path(entry["part"])
+        ok, reason = validate_part(
+            str(output), entry, SETTINGS["part_duration_tolerance"]
+        )
+        if ok and entry["output_sha256"] is not None:
+            if sha256_file(output) != entry["output_sha256"]:
+                ok, reason = False, "checksum changed since validation"
+        elif ok:
+            entry["output_sha256"] = sha256_file(output)
+        entry["validated"] = ok
+        if not ok:
+            entry["output_sha256"] = None
+            name = Path(entry["part"]).name
+            if reason == "missing":
+                print(f"⏳ {name}: not processed yet")
+            else:
+                print(f"❌ {name}: {reason}")
+            invalid.append(entry)
+        else:
+            frames = entry["expected_output_frames"]
+            print(f"✅ {Path(entry['part']).name}: {frames} frames")
+    return invalid
+
+
 def join_videos(
-    parts_folder, output_path, delete_parts=True, pattern=r"input_part_\d{2}\.mp4"
+    parts_folder,
+    output_path,
+    delete_parts=True,
+    pattern=r"input_part_\d{2,}\.mp4",
+    part_files=None,
 ):
-    # Find, filter, and sort part files
+    """
+    Join parts in order. With `part_files` (e.g. the validated outputs from the
+    manifest) exactly those are joined, and any other file in `parts_folder`
+    matching `pattern`, such as a leftover part from a run with more pieces,
+    is an error rather than silently ignored or joined.
+    """
     parts_folder = Path(parts_folder)
-    part_files = [
-        f for f in parts_folder.glob("*.mp4") if re.fullmatch(pattern, f.name)
-    ]
-    part_files.sort(key=lambda f: int(re.search(r"(\d{2})", f.name).group(1)))
+    found = [f for f in parts_folder.glob("*.mp4") if re.fullmatch(pattern, f.name)]
+    if part_files is None:
+        # Find, filter, and sort part files
+        part_files = sorted(
+            found, key=lambda f: int(re.search(r"(\d+)", f.name).group(1))
+        )
+    else:
+        part_files = [Path(f) for f in part_files]
+        expected = {f.resolve() for f in part_files}
+        unexpected = sorted(str(f) for f in found if f.resolve() not in expected)
+        if unexpected:
+            raise RuntimeError(
+                f"Not joining, {parts_folder} has parts that are not in the "
+                f"manifest: {unexpected}"
+            )
 
     clean_files = [str(f) for f in part_files if f.is_file()]
 
@@ -100,7 +267,7 @@ def join_videos(
         temp_path = tf.name
 
     try:
-        subprocess.run(
+        run_stage(
             [
                 "ffmpeg",
                 "-y",
@@ -114,7 +281,7 @@ def join_videos(
                 "copy",
                 str(output_path),
             ],
-            check=True,
+            "join",
         )
         print(f"✅ Joined {len(clean_files)} parts into {output_path}")
     finally:
@@ -130,12 +297,68 @@ def join_videos(
                 print(f"⚠️ Could not delete split part {f}: {e}")
 
 
-gpu_id = SETTINGS["primary_gpu"]
+# GPUs waiting for a part; a part takes one and gives it back when done
+free_gpus = queue.Queue()
+for _gpu in range(SETTINGS["gpus_used_count"]):
+    free_gpus.put(str(_gpu))
+
+
+def historical_fps_by_gpu(width, height):
+    """Whole-part fps per GPU from the throughput history, None if no history."""
+    fps = [
+        throughput_db.baseline_fps(
+            SETTINGS["throughput_db"],
+            "total",
+            gpu,
+            throughput_db.model_key(
+                SETTINGS["waifu_model"], SETTINGS.get("rife_model", "rife-anime")
+            ),
+            SETTINGS["scale"],
+            (width, height),
+            throughput_db.setup_mode(
+                SETTINGS.get("upscale_mode", "full"), SETTINGS.get("window_frames")
+            ),
+            throughput_db.backend_signature(
+                SETTINGS["upscale_backends"], SETTINGS["interpolate_backend"]
+            ),
+        )
+        for gpu in range(SETTINGS["gpus_used_count"])
+    ]
+    known = [f for f in fps if f]
+    if not known:
+        return None
+    # GPUs without history are assumed to be as fast as the average known one
+    return [f or sum(known) / len(known) for f in fps]
+
+
+def plan_shm_chunks(input_video):
+    """plan_chunks_for_shm() for how the configured stages use /dev/shm."""
+    if SETTINGS.get("window_frames"):
+        return plan_chunks_for_shm(
+            video_path=input_video,
+            safety_multiplier=SETTINGS["window_shm_headroom"],
+            window_frames=SETTINGS["window_frames"],
+            scale=SETTINGS["scale"],
+        )
+    # Whole folders of upscaled and interpolated frames
+    return plan_chunks_for_shm(video_path=input_video, safety_multiplier=4)
+
+
+def _hms(seconds):
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{hours}h {minutes}m {secs}s"
 
 
 def process_part(idx, part):
-    global gpu_id
-    gpu_id = str((gpu_id + 1) % SETTINGS["gpus_used_count"])
+    gpu_id = free_gpus.get()
+    try:
+        run_part(idx, part, gpu_id)
+    finally:
+        free_gpus.put(gpu_id)
+
+
+def run_part(idx, part, gpu_id):
     env = os.environ.copy()
     env["GPU"] = gpu_id  # Only if your pipeline uses this (see below!)
 
@@ -154,13 +377,7 @@ def process_part(idx, part):
         shutil.rmtree(part_workdir, ignore_errors=True)
     else:
         print(f"⚠️ Work folder not found: {part_workdir}")
-
-    # === Remove split .mp4 part after processing ===
-    try:
-        Path(part).unlink()
-        print(f"🗑️ Deleted split part: {part}")
-    except Exception as e:
-        print(f"⚠️ Could not delete split part {part}: {e}")
+    # Split part is kept until its output has been validated
 
 
 # --- Example usage:
@@ -171,51 +388,97 @@ if __name__ == "__main__":
         sys.exit(1)
 
     input_video = Path(sys.argv[1])
-
-    if len(sys.argv) < 3:
-        pieces = (
-            plan_chunks_for_shm(video_path=input_video, safety_multiplier=4)[
-                "num_chunks"
-            ]
-            * SETTINGS["gpus_used_count"]
-            + 1
-        )
-        print(f"Chunks needed: {pieces}")
-    else:
-        pieces = int(sys.argv[2])
-
     NAME = input_video.stem
     SETTINGS["file_name"] = NAME
     working_dir = os.path.abspath(Path(SETTINGS["working_dir_base"], f"work_{NAME}"))
     SETTINGS["working_dir"] = working_dir
+    split_dir = Path(working_dir, "splits")
+
+    predicted = None
+    if len(sys.argv) > 2:
+        pieces = int(sys.argv[2])
+    else:
+        pieces = manifest_pieces(input_video, split_dir)
+        if pieces:
+            print(f"♻️ Resuming with {pieces} pieces from {manifest_path(split_dir)}")
+
+    if pieces is None:
+        plan = plan_shm_chunks(input_video)
+        total_frames = plan["total_frames"]
+        shm_pieces = plan["num_chunks"] * SETTINGS["gpus_used_count"] + 1
+        fps_by_gpu = historical_fps_by_gpu(plan["width"], plan["height"])
+        pieces = shm_pieces
+        if fps_by_gpu:
+            pieces, predicted = throughput_db.choose_pieces(
+                total_frames,
+                fps_by_gpu,
+                shm_pieces,
+                SETTINGS["part_overhead_seconds"],
+            )
+        print(f"Chunks needed: {pieces} (shm needs at least {shm_pieces})")
+    else:
+        info = _probe(str(input_video))
+        total_frames = round(info["fps"] * info["duration_seconds"])
+        fps_by_gpu = historical_fps_by_gpu(info["width"], info["height"])
+        if fps_by_gpu:
+            predicted = throughput_db.simulate_makespan(
+                total_frames,
+                pieces,
+                fps_by_gpu,
+                SETTINGS["part_overhead_seconds"],
+            )
+
+    if predicted is not None:
+        print(
+            f"🔮 Predicted wall time: {_hms(predicted)} for {total_frames} "
+            f"frames (history fps per GPU: "
+            f"{', '.join(f'{f:.2f}' for f in fps_by_gpu)})"
+        )
+    else:
+        print("🔮 No throughput history for this setup yet, no ETA.")
 
     # 1. Split video
-    split_dir = Path(working_dir, "splits")
     split_dir.mkdir(exist_ok=True, parents=True)
     parts = split_video(input_video, pieces, split_dir)
     print("Splits:", parts)
+    manifest = load_manifest(manifest_path(split_dir))
+
+    # 2. Process parts whose output is missing or fails validation
+    for attempt in range(1 + SETTINGS["part_retries"]):
+        invalid = validate_parts(manifest)
+        save_manifest(manifest_path(split_dir), manifest)
+        if not invalid:
+            break
+        print(f"▶️ Processing {len(invalid)} of {len(parts)} parts (pass {attempt + 1})")
+        with ThreadPoolExecutor(max_workers=SETTINGS["gpus_used_count"]) as executor:
+            futures = [
+                executor.submit(process_part, entry["index"], entry["part"])
+                for entry in invalid
+            ]
+            for f in as_completed(futures):
+                try:
+                    f.result()
+                except Exception as e:
+                    print(f"❌ Error in parallel part: {e}")
+    else:
+        invalid = validate_parts(manifest)
+        save_manifest(manifest_path(split_dir), manifest)
 
-    # 2. Process each part (call your full pipeline here)
-    with ThreadPoolExecutor(max_workers=SETTINGS["gpus_used_count"]) as executor:
-        futures = []
-        for idx, part in enumerate(parts):
-            futures.append(executor.submit(process_part, idx, part))
-        for f in as_completed(futures):
-            try:
-                f.result()
-            except Exception as e:
-                print(f"❌ Error in parallel part: {e}")
+    if invalid:
+        print(
+            f"❌ {len(invalid)} part(s) still invalid after {SETTINGS['part_retries']} "
+            f"retries, not joining: {[Path(e['part']).name for e in invalid]}"
+        )
+        sys.exit(1)
 
-        # 3. Join all encoded pieces (assume output is in OUTFOLDER, update as needed)
-        processed_parts = [
-            f"{SETTINGS["final_output_folder"]}/{Path(p).stem}.mp4" for p in parts
-        ]
-        final_out = Path(SETTINGS["final_output_folder"], f"{input_video.stem}.mp4")
+    # 3. Join exactly the validated pieces of the manifest
     join_videos(
         SETTINGS["final_output_folder"],
         str(Path(SETTINGS["final_output_folder"], f"{NAME}.mp4")),
+        part_files=manifest_outputs(manifest),
     )
     print(f"\n✅ Final joined output: {NAME}.mp4")
+    shutil.rmtree(split_dir, ignore_errors=True)
 
     task_end = time.time()
     elapsed = task_end - task_start
@@ -225,3 +488,10 @@ if __name__ == "__main__":
     print(
         f"⏱️ Batched Pipeline task done in {hours}h {minutes}m {seconds}s ({elapsed:.2f} sec)."
     )
+    if predicted:
+        print(f"🔮 Predicted {_hms(predicted)}, actual {_hms(elapsed)}.")
+        if elapsed > predicted * (1 + SETTINGS["throughput_warn_drop"]):
+            print(
+                "⚠️ Run was slower than its historical baseline. "
+                "Thermal throttling or driver regression?"
+            )
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Distribute split parts of an episode to upscale workers on other machines.
+
+Coordinator (splits, hands out parts, collects encoded results and joins):
+    python distributed_pipeline.py coordinator <input.mp4> [pieces] [port]
+
+Worker daemon (one connection per local GPU):
+    python distributed_pipeline.py worker <host[:port]> [gpus e.g. 0,1] [name]
+
+Protocol: every message is one JSON line followed by `size` raw bytes of
+payload (the part or the encoded result). A worker registers, then asks for
+work. While a part is processed the worker sends heartbeats; the coordinator
+requeues a part when its lease runs out, the connection drops or its result
+fails validation against splits/manifest.json.
+"""
+
+import json
+import os
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from settings import SETTINGS
+
+
+# === PROTOCOL ===
+def send_message(sock, message, payload=b""):
+    header = dict(message, size=len(payload))
+    sock.sendall(json.dumps(header).encode() + b"\n" + payload)
+
+
+def recv_message(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed by peer")
+    message = json.loads(line)
+    size = message.get("size", 0)
+    payload = stream.read(size) if size else b""
+    if len(payload) != size:
+        raise ConnectionError(f"Truncated payload ({len(payload)}/{size} bytes)")
+    return message, payload
+
+
+# === COORDINATOR ===
+class Coordinator:
+    def __init__(
+        self, parts, output_dir, lease_seconds=None, max_attempts=None, validate=None
+    ):
+        self.parts = [str(p) for p in parts]
+        self.output_dir = Path(output_dir)
+        self.validate = validate  # (part, result path) -> (ok, reason)
+        self.lease_seconds = lease_seconds or SETTINGS["worker_lease_seconds"]
+        self.max_attempts = max_attempts or SETTINGS["worker_max_attempts"]
+        self.pending = deque(self.parts)
+        self.leases = {}  # part -> {"worker": name, "expires": timestamp}
+        self.attempts = {p: 0 for p in self.parts}
+        self.results = {}  # part -> encoded output path
+        self.failed = {}  # part -> last error
+        self.workers = {}  # name -> last seen timestamp
+        self.cond = threading.Condition()
+        self.server = None
+
+    # --- State helpers (call with self.cond held)
+    def _finished(self):
+        return len(self.results) + len(self.failed) == len(self.parts)
+
+    def _release(self, part, reason):
+        lease = self.leases.pop(part, None)
+        if lease is None or part in self.results:
+            return
+        if self.attempts[part] >= self.max_attempts:
+            print(f"❌ Giving up on {Path(part).name}: {reason}")
+            self.failed[part] = reason
+        else:
+            print(f"🔁 Requeue {Path(part).name} from {lease['worker']}: {reason}")
+            self.pending.appendleft(part)
+        self.cond.notify_all()
+
+    def _expire_leases(self):
+        now = time.time()
+        for part, lease in list(self.leases.items()):
+            if lease["expires"] < now:
+                self._release(part, "lease expired")
+
+    # --- Worker requests
+    def register(self, worker):
+        with self.cond:
+            self.workers[worker] = time.time()
+        print(f"🤝 Worker registered: {worker}")
+
+    def next_part(self, worker):
+        with self.cond:
+            self._expire_leases()
+            self.workers[worker] = time.time()
+            if self.pending:
+                part = self.pending.popleft()
+                self.attempts[part] += 1
+                self.leases[part] = {
+                    "worker": worker,
+                    "expires": time.time() + self.lease_seconds,
+                }
+                return "assign", part
+            if self._finished():
+                return "done", None
+            return "wait", None
+
+    def heartbeat(self, worker, part):
+        with self.cond:
+            self.workers[worker] = time.time()
+            lease = self.leases.get(part)
+            if lease and lease["worker"] == worker:
+                lease["expires"] = time.time() + self.lease_seconds
+
+    def complete(self, worker, part, payload):
+        with self.cond:
+            if part in self.results or part not in self.attempts:
+                return
+        out_path = self.output_dir / f"{Path(part).stem}.mp4"
+        tmp_path = out_path.with_suffix(f".{worker.replace(':', '_')}.tmp")
+        tmp_path.write_bytes(payload)
+        if self.validate:
+            ok, reason = self.validate(part, tmp_path)
+            if not ok:
+                tmp_path.unlink()
+                self.fail(worker, part, f"invalid result: {reason}")
+                return
+        with self.cond:
+            if part in self.results:
+                tmp_path.unlink()
+                return
+            os.replace(tmp_path, out_path)
+            self.results[part] = str(out_path)
+            self.leases.pop(part, None)
+            self.failed.pop(part, None)
+            if part in self.pending:
+                self.pending.remove(part)
+            self.cond.notify_all()
+        print(f"✅ {Path(part).name} done by {worker} → {out_path}")
+
+    def fail(self, worker, part, error):
+        with self.cond:
+            lease = self.leases.get(part)
+            if lease and lease["worker"] == worker:
+                self._release(part, f"worker error: {error}")
+
+    def drop_worker(self, worker, reason):
+        with self.cond:
+            self.workers.pop(worker, None)
+            for part, lease in list(self.leases.items()):
+                if lease["worker"] == worker:
+                    self._release(part, reason)
+
+    # --- Server lifecycle
+    def serve(self, host="0.0.0.0", port=None):
+        port = SETTINGS["coordinator_port"] if port is None else port
+        coordinator = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                coordinator._handle(self.request, self.rfile, self.client_address)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"📡 Coordinator listening on {host}:{self.server.server_address[1]}")
+        return self.server.server_address[1]
+
+    def wait(self):
+        with self.cond:
+            while not self._finished():
+                self.cond.wait(timeout=1)
+                self._expire_leases()
+        return [self.results[p] for p in self.parts if p in self.results]
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _handle(self, sock, stream, address):
+        sock.settimeout(self.lease_seconds)
+        worker = f"{address[0]}:{address[1]}"
+        try:
+            message, _ = recv_message(stream)
+            if message.get("type") != "register":
+                return
+            worker = f"{message.get('worker', address[0])}@{address[0]}:{address[1]}"
+            self.register(worker)
+            send_message(
+                sock,
+                {
+                    "type": "registered",
+                    "heartbeat_seconds": SETTINGS["worker_heartbeat_seconds"],
+                },
+            )
+            while True:
+                message, payload = recv_message(stream)
+                kind = message.get("type")
+                if kind == "request":
+                    action, part = self.next_part(worker)
+                    if action == "assign":
+                        print(f"📤 {Path(part).name} → {worker}")
+                        send_message(
+                            sock,
+                            {"type": "assign", "part": Path(part).name, "id": part},
+                            Path(part).read_bytes(),
+                        )
+                    elif action == "wait":
+                        send_message(sock, {"type": "wait", "retry_seconds": 1})
+                    else:
+                        send_message(sock, {"type": "done"})
+                        return
+                elif kind == "heartbeat":
+                    self.heartbeat(worker, message["id"])
+                elif kind == "result":
+                    self.complete(worker, message["id"], payload)
+                elif kind == "failed":
+                    self.fail(worker, message["id"], message.get("error", "unknown"))
+        except (OSError, ConnectionError, ValueError) as e:
+            print(f"⚠️ Lost worker {worker}: {e}")
+        finally:
+            self.drop_worker(worker, "worker disconnected")
+
+
+def distribute_parts(parts, output_dir, host="0.0.0.0", port=None, validate=None):
+    coordinator = Coordinator(parts, output_dir, validate=validate)
+    coordinator.serve(host, port)
+    try:
+        results = coordinator.wait()
+    finally:
+        coordinator.shutdown()
+    for part, error in coordinator.failed.items():
+        print(f"❌ Part failed on all attempts: {part} ({error})")
+    return results
+
+
+# === WORKER ===
+def worker_output_dir(name):
+    """Per-worker folder for encoded parts, separate from the coordinator's join folder."""
+    return Path(SETTINGS["working_dir_base"], "worker_out", name)
+
+
+def process_assigned_part(part_path, gpu, output_dir, command=None):
+    """Run the local pipeline for one part and return the encoded output bytes."""
+    command = command or SETTINGS["worker_command"]
+    part_name = Path(part_path).stem
+    # The encode script only moves its output into a folder that exists
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    subprocess.run([*command, str(part_path), str(gpu), str(output_dir)], check=True)
+
+    output_path = Path(output_dir, f"{part_name}.mp4")
+    try:
+        return output_path.read_bytes()
+    finally:
+        output_path.unlink(missing_ok=True)
+        part_workdir = Path(SETTINGS["working_dir_base"], f"work_{part_name}")
+        if part_workdir.exists():
+            shutil.rmtree(part_workdir, ignore_errors=True)
+
+
+def run_worker(host, port, gpu, name=None, command=None):
+    name = name or f"{socket.gethostname()}-gpu{gpu}"
+    received_dir = Path(SETTINGS["working_dir_base"], "received_parts")
+    received_dir.mkdir(parents=True, exist_ok=True)
+    output_dir = worker_output_dir(name)
+
+    with socket.create_connection((host, port)) as sock:
+        stream = sock.makefile("rb")
+        send_message(sock, {"type": "register", "worker": name, "gpu": str(gpu)})
+        message, _ = recv_message(stream)
+        heartbeat_seconds = message.get(
+            "heartbeat_seconds", SETTINGS["worker_heartbeat_seconds"]
+        )
+        print(f"🤝 {name} registered with {host}:{port}")
+
+        while True:
+            send_message(sock, {"type": "request"})
+            message, payload = recv_message(stream)
+            if message["type"] == "done":
+                print(f"🏁 {name}: no more parts")
+                return
+            if message["type"] == "wait":
+                time.sleep(message.get("retry_seconds", 1))
+                continue
+
+            part_path = received_dir / Path(message["part"]).name
+            part_path.write_bytes(payload)
+            print(f"\n=== {name}: processing {part_path.name} on GPU {gpu} ===")
+
+            outcome = {}
+
+            def job():
+                try:
+                    outcome["result"] = process_assigned_part(
+                        part_path, gpu, output_dir, command
+                    )
+                except Exception as e:
+                    outcome["error"] = str(e)
+
+            thread = threading.Thread(target=job, daemon=True)
+            thread.start()
+            while thread.is_alive():
+                thread.join(heartbeat_seconds)
+                if thread.is_alive():
+                    send_message(sock, {"type": "heartbeat", "id": message["id"]})
+            part_path.unlink(missing_ok=True)
+
+            if "result" in outcome:
+                send_message(
+                    sock, {"type": "result", "id": message["id"]}, outcome["result"]
+                )
+            else:
+                print(f"❌ {name}: {part_path.name} failed: {outcome.get('error')}")
+                send_message(
+                    sock,
+                    {"type": "failed", "id": message["id"], "error": outcome.get("error")},
+                )
+
+
+# === MAIN ===
+if __name__ == "__main__":
+    task_start = time.time()
+    if len(sys.argv) < 3 or sys.argv[1] not in ("coordinator", "worker"):
+        print(
+            "Usage: distributed_pipeline.py coordinator <input.mp4> [pieces] [port]\n"
+            "       distributed_pipeline.py worker <host[:port]> [gpus] [name]"
+        )
+        sys.exit(1)
+
+    if sys.argv[1] == "worker":
+        host, _, port = sys.argv[2].partition(":")
+        port = int(port) if port else SETTINGS["coordinator_port"]
+        gpus = sys.argv[3].split(",") if len(sys.argv) > 3 else [SETTINGS["primary_gpu"]]
+        name = sys.argv[4] if len(sys.argv) > 4 else None
+        threads = [
+            threading.Thread(
+                target=run_worker,
+                args=(host, port, gpu, f"{name}-gpu{gpu}" if name else None),
+            )
+            for gpu in gpus
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        sys.exit(0)
+
+    from batched_pipeline import (
+        join_videos,
+        manifest_outputs,
+        manifest_path,
+        manifest_pieces,
+        plan_shm_chunks,
+        split_video,
+        validate_parts,
+    )
+    from util.part_manifest import load_manifest, save_manifest, validate_part
+
+    input_video = Path(sys.argv[2])
+    port = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    NAME = input_video.stem
+    SETTINGS["file_name"] = NAME
+    SETTINGS["working_dir"] = os.path.abspath(
+        Path(SETTINGS["working_dir_base"], f"work_{NAME}")
+    )
+    Path(SETTINGS["final_output_folder"]).mkdir(parents=True, exist_ok=True)
+    split_dir = Path(SETTINGS["working_dir"], "splits")
+
+    if len(sys.argv) > 3:
+        pieces = int(sys.argv[3])
+    else:
+        pieces = manifest_pieces(input_video, split_dir)
+        if pieces:
+            print(f"♻️ Resuming with {pieces} pieces from {manifest_path(split_dir)}")
+    if pieces is None:
+        pieces = plan_shm_chunks(input_video)["num_chunks"]
+        print(f"Chunks needed: {pieces}")
+
+    # 1. Split video
+    split_dir.mkdir(exist_ok=True, parents=True)
+    parts = split_video(input_video, pieces, split_dir)
+    print("Splits:", parts)
+    manifest = load_manifest(manifest_path(split_dir))
+    entries = {entry["part"]: entry for entry in manifest["parts"]}
+
+    def validate_result(part, path):
+        return validate_part(
+            str(path), entries[part], SETTINGS["part_duration_tolerance"]
+        )
+
+    # 2. Hand out parts whose output is missing or invalid; results failing
+    # validation are requeued up to worker_max_attempts
+    invalid = validate_parts(manifest)
+    save_manifest(manifest_path(split_dir), manifest)
+    if invalid:
+        print(f"▶️ Distributing {len(invalid)} of {len(parts)} parts")
+        distribute_parts(
+            [entry["part"] for entry in invalid],
+            SETTINGS["final_output_folder"],
+            port=port,
+            validate=validate_result,
+        )
+        invalid = validate_parts(manifest)
+        save_manifest(manifest_path(split_dir), manifest)
+
+    # 3. Join exactly the validated pieces of the manifest
+    if invalid:
+        print(
+            f"❌ {len(invalid)} part(s) invalid, not joining: "
+            f"{[Path(e['part']).name for e in invalid]}"
+        )
+        sys.exit(1)
+    join_videos(
+        SETTINGS["final_output_folder"],
+        str(Path(SETTINGS["final_output_folder"], f"{NAME}.mp4")),
+        part_files=manifest_outputs(manifest),
+    )
+    print(f"\n✅ Final joined output: {NAME}.mp4")
+    shutil.rmtree(split_dir, ignore_errors=True)
+
+    elapsed = time.time() - task_start
+    hours, remainder = divmod(int(elapsed), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    print(
+        f"⏱️ Distributed Pipeline task done in {hours}h {minutes}m {seconds}s ({elapsed:.2f} sec)."
+    )
@@ -21,6 +21,53 @@ SETTINGS = {
     "gpus_used_count": 2,
     "framerate": 25,
     "batch_size": 20,
-    "threads": "2:1:9",
+    "threads": "2:1:9",  # fallback when no tuned profile entry matches
     "final_encoder": "h264",
+    # Backends: "ncnn" (waifu2x/rife CLIs, optional "gpu", -1 = CPU) or
+    # "cpu" (process pool resampler, optional "workers"). Several upscale
+    # backends split frames by "share", e.g. add {"type": "cpu", "share": 1}.
+    "upscale_backends": [{"type": "ncnn"}],
+    "interpolate_backend": {"type": "ncnn"},
+    # Frames per rolling window; consumed frames are deleted per window and
+    # streamed into the encoder. 0 = whole folders per stage.
+    "window_frames": 500,
+    "window_shm_headroom": 1.5,  # shm safety multiplier for piece planning with windows
+    # Upscale mode: "full" or "changed_regions" (only changed tiles, needs numpy+Pillow)
+    "upscale_mode": "full",
+    "region_tile_size": 64,
+    "region_tile_padding": 16,  # source pixels around a tile for the model's receptive field
+    "region_threshold": 6,  # max per-channel difference still treated as unchanged
+    "region_refresh_interval": 50,  # full frame upscale at least every N frames
+    "region_scene_cut_fraction": 0.5,  # more changed tiles than this = scene cut
+    # Resource governor: per-stage CPU affinity (taskset), nice and ionice
+    # (class 1-3, level 0-7). Defaults keep 4 cores + SMT siblings of a
+    # 9800X3D for the waifu2x/RIFE load/save threads feeding the GPUs.
+    "stage_resources": {
+        "split": {"cpus": "4-7,12-15", "nice": 10, "ionice": 2, "ionice_level": 7},
+        "preprocess": {"cpus": "4-7,12-15", "nice": 10, "ionice": 2, "ionice_level": 7},
+        "extract": {"cpus": "4-7,12-15", "nice": 10, "ionice": 2, "ionice_level": 7},
+        "upscale": {"cpus": "0-3,8-11", "ionice": 2, "ionice_level": 0},
+        "interpolate": {"cpus": "0-3,8-11", "ionice": 2, "ionice_level": 0},
+        "encode": {"cpus": "4-7,12-15", "nice": 5, "ionice": 2, "ionice_level": 4},
+        "join": {"nice": 10, "ionice": 3},
+    },
+    "resource_log": "resource_usage.jsonl",
+    # Throughput history (ETA, piece count, slow run warnings)
+    "throughput_db": "throughput.sqlite3",
+    "throughput_warn_drop": 0.2,  # warn when fps is 20% below historical median
+    "part_overhead_seconds": 30,  # extra cost per added part (split, model load, encode)
+    # Tile/thread tuning (tune_pipeline.py)
+    "tuning_profile": "tuning_profile.json",
+    "tuning_tile_sizes": [0, 100, 200, 400],
+    "tuning_threads": ["1:2:2", "2:1:9", "2:2:4", "2:4:4", "4:4:8"],
+    # Part validation before join (frame counts from splits/manifest.json)
+    "part_retries": 2,  # reprocess parts failing validation this many times
+    "part_duration_tolerance": 0.5,  # seconds
+    # Multi-node distribution (distributed_pipeline.py)
+    "coordinator_port": 8765,
+    # called as <cmd> <part> <gpu> <output folder>
+    "worker_command": ["python3", "upscale_pipeline.py"],
+    "worker_heartbeat_seconds": 10,
+    "worker_lease_seconds": 60,  # requeue a part if its worker is silent this long
+    "worker_max_attempts": 3,
 }
@@ -0,0 +1,137 @@
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import backends
+import upscale_pipeline
+from util import tuning_profile
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed by the CPU backend
+    Image = None
+
+
+class FakeBackend:
+    def __init__(self, share):
+        self.share = share
+        self.calls = []
+
+    def upscale(self, input_dir, output_dir, frames=None):
+        self.calls.append([Path(f).name for f in frames])
+
+
+class TestBackends(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.frames_dir = self.root / "frames"
+        self.output_dir = self.root / "output"
+        self.frames_dir.mkdir()
+        self.output_dir.mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_split_by_share(self):
+        frames = list(range(10))
+        shards = backends.split_by_share(frames, [FakeBackend(3), FakeBackend(1)])
+        self.assertEqual([len(s) for s in shards], [8, 2])
+        self.assertEqual(sum(shards, []), frames)
+
+    def test_ncnn_backend_subset_is_linked_into_folder(self):
+        seen = []
+
+        def fake_run(cmd):
+            input_dir = Path(cmd[cmd.index("-i") + 1])
+            seen.append(sorted(p.name for p in input_dir.iterdir()))
+            self.assertEqual(cmd[cmd.index("-g") + 1], "1")
+            self.assertEqual(cmd[cmd.index("-t") + 1], "200")
+
+        for i in range(3):
+            (self.frames_dir / f"frame_{i:06d}.png").write_bytes(b"png")
+        backend = backends.make_backend(
+            {"type": "ncnn", "gpu": 1}, threads="2:2:4", tile=200, run=fake_run
+        )
+        frames = sorted(self.frames_dir.glob("*.png"))[1:]
+        backend.upscale(self.frames_dir, self.output_dir, frames)
+        self.assertEqual(seen, [["frame_000001.png", "frame_000002.png"]])
+
+    def test_tuned_params_are_looked_up_per_backend_gpu(self):
+        (self.frames_dir / "frame_000001.png").write_bytes(
+            b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR"
+            + struct.pack(">II", 720, 576)
+        )
+        model = "models-upconv_7_anime_style_art_rgb"
+        profile = self.root / "tuning_profile.json"
+        tuning_profile.save_profile(
+            str(profile),
+            {
+                tuning_profile.profile_key(gpu, "waifu2x", model, (720, 576)): entry
+                for gpu, entry in (
+                    (1, {"threads": "2:2:4", "tile": 200}),
+                    (0, {"threads": "1:2:2", "tile": 400}),
+                    (-1, {"threads": "1:8:2", "tile": 100}),
+                )
+            },
+        )
+        settings = {
+            "primary_gpu": 1,
+            "waifu_model": model,
+            "threads": "2:1:9",
+            "tuning_profile": str(profile),
+            "upscale_backends": [
+                {"type": "ncnn"},
+                {"type": "ncnn", "gpu": 0},
+                {"type": "ncnn", "gpu": -1},
+                {"type": "ncnn", "gpu": 2},
+            ],
+        }
+        with patch.dict(upscale_pipeline.SETTINGS, settings):
+            found = [
+                (b.gpu, b.threads, b.tile)
+                for b in upscale_pipeline.upscale_backends(self.frames_dir)
+            ]
+        self.assertEqual(
+            found,
+            [
+                (1, "2:2:4", 200),
+                (0, "1:2:2", 400),
+                (-1, "1:8:2", None),  # no GPU tile size for ncnn on CPU
+                (2, "2:1:9", None),  # untuned GPU falls back to the defaults
+            ],
+        )
+
+    def test_upscale_shared_runs_every_backend(self):
+        for i in range(5):
+            (self.frames_dir / f"frame_{i:06d}.png").write_bytes(b"png")
+        fakes = [FakeBackend(4), FakeBackend(1)]
+        backends.upscale_shared(fakes, self.frames_dir, self.output_dir)
+        self.assertEqual(len(fakes[0].calls[0]), 4)
+        self.assertEqual(fakes[1].calls, [["frame_000004.png"]])
+
+    @unittest.skipIf(Image is None, "Pillow not installed")
+    def test_cpu_backend(self):
+        for i, value in enumerate((0, 100, 200)):
+            Image.new("RGB", (8, 6), (value, value, value)).save(
+                self.frames_dir / f"frame_{i:06d}.png"
+            )
+        backend = backends.CpuBackend(workers=2, scale=2)
+        backend.upscale(self.frames_dir, self.output_dir)
+        with Image.open(self.output_dir / "frame_000001.png") as im:
+            self.assertEqual(im.size, (16, 12))
+
+        interpolated = self.root / "interpolated"
+        interpolated.mkdir()
+        backend.interpolate(self.frames_dir, interpolated)
+        names = sorted(p.name for p in interpolated.glob("*.png"))
+        self.assertEqual(names, [f"{i:08d}.png" for i in range(1, 7)])
+        with Image.open(interpolated / "00000002.png") as im:
+            self.assertEqual(im.getpixel((0, 0)), (50, 50, 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+import distributed_pipeline
+from distributed_pipeline import Coordinator, recv_message, run_worker, send_message
+
+
+# Stand-in for upscale_pipeline.py: "encodes" a part by tagging its bytes
+STAND_IN = (
+    "import sys, pathlib; part = pathlib.Path(sys.argv[1]); "
+    "out = pathlib.Path(sys.argv[3]) / (part.stem + '.mp4'); "
+    "out.write_bytes(b'up:' + sys.argv[2].encode() + b':' + part.read_bytes())"
+)
+
+
+class TestDistributedPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.splits = root / "splits"
+        self.results = root / "results"
+        self.shm = root / "shm"
+        for d in (self.splits, self.results):
+            d.mkdir()
+        self.parts = []
+        for i in range(5):
+            part = self.splits / f"input_part_{i+1:02d}.mp4"
+            part.write_bytes(f"part-{i+1}".encode())
+            self.parts.append(part)
+
+        self.saved = dict(distributed_pipeline.SETTINGS)
+        distributed_pipeline.SETTINGS.update(
+            {
+                "working_dir_base": str(self.shm),
+                # Missing on worker machines; workers must not write there
+                "final_output_folder": str(root / "missing"),
+                "worker_heartbeat_seconds": 0.2,
+            }
+        )
+        self.command = [sys.executable, "-c", STAND_IN]
+
+    def tearDown(self):
+        distributed_pipeline.SETTINGS.clear()
+        distributed_pipeline.SETTINGS.update(self.saved)
+        self.tmp.cleanup()
+
+    def start_worker(self, port, gpu):
+        t = threading.Thread(
+            target=run_worker,
+            args=("127.0.0.1", port, gpu, f"w{gpu}", self.command),
+            daemon=True,
+        )
+        t.start()
+        return t
+
+    def test_parts_distributed_over_several_workers(self):
+        coordinator = Coordinator(self.parts, self.results, lease_seconds=5)
+        port = coordinator.serve("127.0.0.1", 0)
+        try:
+            workers = [self.start_worker(port, gpu) for gpu in (0, 1, 2)]
+            results = coordinator.wait()
+            for w in workers:
+                w.join(timeout=5)
+        finally:
+            coordinator.shutdown()
+
+        self.assertEqual(
+            [Path(r).name for r in results], [p.name for p in self.parts]
+        )
+        for i, result in enumerate(results):
+            data = Path(result).read_bytes()
+            self.assertTrue(data.startswith(b"up:"))
+            self.assertTrue(data.endswith(f"part-{i+1}".encode()))
+        self.assertFalse(coordinator.failed)
+        # Worker outputs are removed from the workers' own folders after upload
+        for gpu in (0, 1, 2):
+            self.assertEqual(list((self.shm / "worker_out" / f"w{gpu}").iterdir()), [])
+
+    def test_dead_worker_part_is_requeued(self):
+        coordinator = Coordinator(self.parts, self.results, lease_seconds=5)
+        port = coordinator.serve("127.0.0.1", 0)
+        try:
+            # Worker that takes a part and dies without answering
+            with socket.create_connection(("127.0.0.1", port)) as sock:
+                stream = sock.makefile("rb")
+                send_message(sock, {"type": "register", "worker": "flaky"})
+                recv_message(stream)
+                send_message(sock, {"type": "request"})
+                message, payload = recv_message(stream)
+                self.assertEqual(message["type"], "assign")
+                self.assertEqual(payload, b"part-1")
+
+            self.start_worker(port, 0)
+            results = coordinator.wait()
+        finally:
+            coordinator.shutdown()
+
+        self.assertEqual(len(results), len(self.parts))
+        self.assertEqual(coordinator.attempts[str(self.parts[0])], 2)
+
+    def test_invalid_result_is_requeued(self):
+        checked = []
+
+        def validate(part, path):
+            checked.append(Path(part).name)
+            # First result of part 1 is "truncated"
+            if checked.count("input_part_01.mp4") == 1 and part.endswith("01.mp4"):
+                return False, "249 frames, expected 250"
+            return True, "ok"
+
+        coordinator = Coordinator(
+            self.parts[:2], self.results, lease_seconds=5, validate=validate
+        )
+        port = coordinator.serve("127.0.0.1", 0)
+        try:
+            self.start_worker(port, 0)
+            results = coordinator.wait()
+        finally:
+            coordinator.shutdown()
+
+        self.assertEqual(len(results), 2)
+        self.assertEqual(coordinator.attempts[str(self.parts[0])], 2)
+        self.assertEqual(coordinator.attempts[str(self.parts[1])], 1)
+        self.assertEqual(
+            sorted(p.name for p in self.results.iterdir()),
+            ["input_part_01.mp4", "input_part_02.mp4"],
+        )
+
+    def test_expired_lease_is_requeued(self):
+        coordinator = Coordinator(self.parts[:1], self.results, lease_seconds=0.1)
+        action, part = coordinator.next_part("silent")
+        self.assertEqual(action, "assign")
+        threading.Event().wait(0.2)
+        with coordinator.cond:
+            coordinator._expire_leases()
+        self.assertEqual(list(coordinator.pending), [part])
+        self.assertNotIn(part, coordinator.leases)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import io
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from util import dvd_iso
+
+SECTOR = dvd_iso.SECTOR
+
+
+def dir_record(name, lba, size, is_dir=False):
+    name = name.encode()
+    rec_len = 33 + len(name) + (len(name) + 1) % 2
+    rec = bytearray(rec_len)
+    rec[0] = rec_len
+    rec[2:10] = struct.pack("<I", lba) + struct.pack(">I", lba)
+    rec[10:18] = struct.pack("<I", size) + struct.pack(">I", size)
+    rec[25] = 0x02 if is_dir else 0
+    rec[32] = len(name)
+    rec[33 : 33 + len(name)] = name
+    return bytes(rec)
+
+
+def vts_ifo(*durations):
+    """VTS IFO with one PGC per (hh, mm, ss) duration, PAL frame rate."""
+    ifo = bytearray(2 * SECTOR)
+    ifo[:12] = b"DVDVIDEO-VTS"
+    ifo[0xCC:0xD0] = struct.pack(">I", 1)
+    pgci = SECTOR
+    struct.pack_into(">H", ifo, pgci, len(durations))
+    for i, (hh, mm, ss) in enumerate(durations):
+        pgc_off = 8 + len(durations) * 8 + i * 16
+        struct.pack_into(">I", ifo, pgci + 8 + i * 8 + 4, pgc_off)
+        bcd = [int(f"{v:02d}", 16) for v in (hh, mm, ss)]
+        ifo[pgci + pgc_off + 4 : pgci + pgc_off + 8] = bytes(bcd + [0x40])
+    return bytes(ifo)
+
+
+def build_iso(path, files):
+    """Minimal ISO9660 image: root dir → VIDEO_TS → files (one extent each)."""
+    next_lba = 20
+    layout = []
+    for name, data in files.items():
+        layout.append((name, next_lba, data))
+        next_lba += max(1, (len(data) + SECTOR - 1) // SECTOR)
+
+    image = bytearray(next_lba * SECTOR)
+    pvd = bytearray(SECTOR)
+    pvd[0] = 1
+    pvd[1:6] = b"CD001"
+    pvd[128:132] = struct.pack("<H", SECTOR) + struct.pack(">H", SECTOR)
+    pvd[156:190] = dir_record("\x00", 18, SECTOR, is_dir=True)
+    image[16 * SECTOR : 17 * SECTOR] = pvd
+    image[17 * SECTOR] = 255
+
+    root = dir_record("\x00", 18, SECTOR, True) + dir_record("\x01", 18, SECTOR, True)
+    root += dir_record("VIDEO_TS", 19, SECTOR, is_dir=True)
+    image[18 * SECTOR : 18 * SECTOR + len(root)] = root
+
+    video_ts = dir_record("\x00", 19, SECTOR, True) + dir_record("\x01", 18, SECTOR, True)
+    for name, lba, data in layout:
+        video_ts += dir_record(f"{name};1", lba, len(data))
+        image[lba * SECTOR : lba * SECTOR + len(data)] = data
+    image[19 * SECTOR : 19 * SECTOR + len(video_ts)] = video_ts
+    Path(path).write_bytes(bytes(image))
+
+
+class TestDvdIso(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.iso = str(Path(self.tmp.name) / "disc.iso")
+        build_iso(
+            self.iso,
+            {
+                "VIDEO_TS.IFO": b"DVDVIDEO-VMG",
+                "VTS_01_0.IFO": vts_ifo((0, 1, 30)),
+                "VTS_01_0.VOB": b"menu" * 1000,
+                "VTS_01_1.VOB": b"A" * 5000,
+                "VTS_02_0.IFO": vts_ifo((0, 2, 0), (0, 22, 15)),
+                "VTS_02_1.VOB": b"B" * 3000,
+                "VTS_02_2.VOB": b"C" * 2500,
+            },
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_list_titles(self):
+        titles = dvd_iso.list_titles(self.iso)
+        self.assertEqual([t["vts"] for t in titles], [1, 2])
+        self.assertEqual(titles[0]["duration_seconds"], 90)
+        self.assertEqual(titles[1]["duration_seconds"], 22 * 60 + 15)
+        self.assertEqual(
+            [v["name"] for v in titles[1]["vobs"]], ["VTS_02_1.VOB", "VTS_02_2.VOB"]
+        )
+
+    def test_main_title_by_duration_not_size(self):
+        # VTS 01 has the bigger VOB but the shorter playback time
+        self.assertEqual(dvd_iso.main_title(self.iso)["vts"], 2)
+
+    def test_stream_title_reads_extents(self):
+        out = io.BytesIO()
+        written = dvd_iso.stream_title(self.iso, out)
+        self.assertEqual(out.getvalue(), b"B" * 3000 + b"C" * 2500)
+        self.assertEqual(written, 5500)
+
+        out = io.BytesIO()
+        dvd_iso.stream_title(self.iso, out, vts=1)
+        self.assertEqual(out.getvalue(), b"A" * 5000)
+
+    def test_not_an_iso(self):
+        bogus = Path(self.tmp.name) / "bogus.iso"
+        bogus.write_bytes(b"\x00" * 40 * SECTOR)
+        with self.assertRaises(ValueError):
+            dvd_iso.list_titles(str(bogus))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import upscale_pipeline
+from util import estimate_png_frames_size
+from util.frame_windows import FrameRefs, plan_windows
+from util.resource_governor import start_governed
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed by the CPU backend
+    Image = None
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class TestFrameWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_plan_windows(self):
+        self.assertEqual(plan_windows(7, 3), [(0, 3), (3, 6), (6, 7)])
+        self.assertEqual(plan_windows(0, 3), [])
+
+    def test_frame_refs_delete_after_last_consumer(self):
+        shared = self.root / "frame_000004.png"
+        single = self.root / "frame_000005.png"
+        shared.write_bytes(b"x")
+        single.write_bytes(b"x")
+        refs = FrameRefs()
+        refs.add(shared, 2)
+        refs.add(single)
+
+        self.assertFalse(refs.release(shared))
+        self.assertTrue(shared.exists())
+        self.assertTrue(refs.release(shared))
+        self.assertFalse(shared.exists())
+        self.assertTrue(refs.release(single))
+        self.assertEqual(len(refs), 0)
+
+    def test_shm_plan_with_windows_needs_fewer_chunks(self):
+        estimate = {
+            "width": 720,
+            "height": 576,
+            "fps": 25.0,
+            "duration_seconds": 1200.0,
+            "total_frames": 30000,
+            "avg_frame_size_bytes": 500_000,
+            "estimated_total_bytes": 30000 * 500_000,
+            "estimated_total_human": "",
+            "method": "sampled",
+        }
+        shm = {"path": "/dev/shm", "total_bytes": 0, "available_bytes": 16 * 2**30}
+        with patch.object(
+            estimate_png_frames_size, "estimate_png_frames_size", return_value=estimate
+        ), patch.object(estimate_png_frames_size, "get_shm_stats", return_value=shm):
+            folders = estimate_png_frames_size.plan_chunks_for_shm(
+                "ep.mp4", safety_multiplier=4
+            )
+            windowed = estimate_png_frames_size.plan_chunks_for_shm(
+                "ep.mp4", safety_multiplier=1.5, window_frames=500, scale=2
+            )
+        # frames + 2 upscaled windows + 1 interpolated window, 4x pixels each
+        self.assertEqual(windowed["window_bytes"], 500_000 * 4 * 500 * 4)
+        self.assertEqual(
+            windowed["allowed_bytes_per_chunk"],
+            int(16 * 2**30 / 1.5 - windowed["window_bytes"]),
+        )
+        self.assertLess(windowed["num_chunks"], folders["num_chunks"])
+
+    @unittest.skipIf(Image is None, "Pillow not installed")
+    def test_process_windows_streams_and_deletes(self):
+        work = self.root / "work_ep"
+        frames_dir = work / "frames"
+        frames_dir.mkdir(parents=True)
+        for i in range(7):
+            Image.new("RGB", (4, 4), (i * 30, 0, 0)).save(
+                frames_dir / f"frame_{i + 1:06d}.png"
+            )
+        encoded = self.root / "encoded.bin"
+
+        def fake_encoder():
+            return start_governed(
+                ["sh", "-c", f"cat > {encoded}"], "encode", {}, stdin=-1
+            )
+
+        settings = {
+            "working_dir": str(work),
+            "file_name": "ep",
+            "window_frames": 3,
+            "upscale_mode": "full",
+            "upscale_backends": [{"type": "cpu", "workers": 1}],
+            "interpolate_backend": {"type": "cpu", "workers": 1},
+            "tuning_profile": str(self.root / "tuning.json"),
+            "throughput_db": str(self.root / "throughput.sqlite3"),
+            "resource_log": None,
+        }
+        with patch.dict(upscale_pipeline.SETTINGS, settings), patch(
+            "upscale_pipeline.start_encoder", fake_encoder
+        ):
+            upscale_pipeline.process_windows()
+
+        data = encoded.read_bytes()
+        pngs = [PNG_SIGNATURE + chunk for chunk in data.split(PNG_SIGNATURE)[1:]]
+        reds = []
+        for png in pngs:
+            with Image.open(io.BytesIO(png)) as im:
+                self.assertEqual(im.size, (8, 8))
+                reds.append(im.getpixel((0, 0))[0])
+        # frame, midpoint, frame, ... across window boundaries, last frame held
+        self.assertEqual(reds, [v * 15 for v in range(13)] + [180])
+        self.assertEqual(sorted(p.name for p in work.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import batched_pipeline
+from util import part_manifest
+
+
+class TestPartManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_frame_ranges_cover_every_frame_once(self):
+        ranges = part_manifest.frame_ranges(1001, 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 1001)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+        self.assertEqual(sum(e - s for s, e in ranges), 1001)
+        self.assertEqual(len(part_manifest.frame_ranges(3, 10)), 3)
+
+    def test_manifest_roundtrip(self):
+        path = str(self.root / "manifest.json")
+        self.assertIsNone(part_manifest.load_manifest(path))
+        part_manifest.save_manifest(path, {"parts": [{"index": 0}]})
+        self.assertEqual(part_manifest.load_manifest(path), {"parts": [{"index": 0}]})
+
+    @patch("util.part_manifest.probe_duration")
+    @patch("util.part_manifest.count_video_packets")
+    def test_validate_part(self, mock_packets, mock_duration):
+        entry = {"expected_output_frames": 250, "expected_seconds": 10.0}
+        output = self.root / "input_part_01.mp4"
+        self.assertEqual(part_manifest.validate_part(str(output), entry), (False, "missing"))
+
+        output.write_bytes(b"video")
+        mock_packets.return_value, mock_duration.return_value = 250, 10.04
+        self.assertTrue(part_manifest.validate_part(str(output), entry)[0])
+
+        mock_packets.return_value = 249  # dropped frame
+        ok, reason = part_manifest.validate_part(str(output), entry)
+        self.assertFalse(ok)
+        self.assertIn("249 frames", reason)
+
+        mock_packets.return_value, mock_duration.return_value = 250, 12.0
+        self.assertFalse(part_manifest.validate_part(str(output), entry)[0])
+
+    def test_split_video_seeks_early_and_expects_encoder_rate(self):
+        source = self.root / "source.mp4"
+        source.write_bytes(b"source")
+        split_dir = self.root / "splits"
+        split_dir.mkdir()
+        fps = 30000 / 1001
+        ranges = part_manifest.frame_ranges(3003, 3)
+        seeks = []
+
+        def fake_split(cmd, stage):
+            seeks.append(float(cmd[cmd.index("-ss") + 1]))
+            Path(cmd[-1]).write_bytes(b"part")
+
+        packets = [3003] + [end - start for start, end in ranges]
+        with patch.dict(
+            batched_pipeline.SETTINGS,
+            {"final_encoder": "h264", "final_output_folder": str(self.root / "out")},
+        ), patch("batched_pipeline._probe", return_value={"fps": fps}), patch(
+            "batched_pipeline.count_video_packets", side_effect=packets
+        ), patch(
+            "batched_pipeline.run_stage", side_effect=fake_split
+        ):
+            batched_pipeline.split_video(source, 3, split_dir)
+
+        for seek, (start, _) in zip(seeks, ranges):
+            # Frame `start` must be after the seek point, frame start-1 before it
+            self.assertLessEqual(seek, start / fps)
+            if start:
+                self.assertLess(seek, start / fps)
+                self.assertGreater(seek, (start - 1) / fps)
+        manifest = part_manifest.load_manifest(str(split_dir / "manifest.json"))
+        # The encoder outputs 25 fps whatever the source rate was
+        self.assertEqual(manifest["parts"][0]["expected_seconds"], 1001 / 25)
+
+    def test_manifest_pieces_resumes_same_source(self):
+        source = self.root / "source.mp4"
+        source.write_bytes(b"source")
+        split_dir = self.root / "splits"
+        split_dir.mkdir()
+        with patch.dict(batched_pipeline.SETTINGS, {"final_encoder": "h264"}):
+            self.assertIsNone(batched_pipeline.manifest_pieces(source, split_dir))
+            part_manifest.save_manifest(
+                str(split_dir / "manifest.json"),
+                {
+                    "source": part_manifest.source_identity(str(source)),
+                    "final_encoder": "h264",
+                    "parts": [{"index": i} for i in range(7)],
+                },
+            )
+            self.assertEqual(batched_pipeline.manifest_pieces(source, split_dir), 7)
+
+            source.write_bytes(b"another source")
+            self.assertIsNone(batched_pipeline.manifest_pieces(source, split_dir))
+
+    def test_join_refuses_parts_not_in_manifest(self):
+        out_dir = self.root / "final"
+        out_dir.mkdir()
+        manifest = {
+            "parts": [
+                {"part": str(self.root / f"input_part_{i+1:02d}.mp4"), "index": i}
+                for i in (1, 0)
+            ]
+        }
+        for i in range(3):  # input_part_03.mp4 is left over from a longer run
+            (out_dir / f"input_part_{i+1:02d}.mp4").write_bytes(b"out")
+
+        joined = []
+        with patch.dict(
+            batched_pipeline.SETTINGS, {"final_output_folder": str(out_dir)}
+        ), patch(
+            "batched_pipeline.run_stage",
+            side_effect=lambda cmd, stage: joined.append(
+                Path(cmd[cmd.index("-i") + 1]).read_text()
+            ),
+        ):
+            outputs = batched_pipeline.manifest_outputs(manifest)
+            self.assertEqual(
+                [Path(o).name for o in outputs],
+                ["input_part_01.mp4", "input_part_02.mp4"],
+            )
+            with self.assertRaises(RuntimeError):
+                batched_pipeline.join_videos(
+                    out_dir, out_dir / "ep.mp4", part_files=outputs
+                )
+            self.assertEqual(joined, [])
+
+            (out_dir / "input_part_03.mp4").unlink()
+            batched_pipeline.join_videos(
+                out_dir, out_dir / "ep.mp4", part_files=outputs
+            )
+        self.assertEqual(len(joined), 1)
+        self.assertEqual(
+            [line.split("/")[-1] for line in joined[0].splitlines()],
+            ["input_part_01.mp4'", "input_part_02.mp4'"],
+        )
+
+    def test_validate_parts_only_returns_failures(self):
+        out_dir = self.root / "final"
+        out_dir.mkdir()
+        manifest = {"parts": []}
+        for i in range(3):
+            manifest["parts"].append(
+                {
+                    "part": str(self.root / f"input_part_{i+1:02d}.mp4"),
+                    "index": i,
+                    "expected_output_frames": 100,
+                    "expected_seconds": 4.0,
+                    "output_sha256": None,
+                    "validated": False,
+                }
+            )
+            (out_dir / f"input_part_{i+1:02d}.mp4").write_bytes(f"out{i}".encode())
+
+        results = {
+            "input_part_01.mp4": (True, "ok"),
+            "input_part_02.mp4": (False, "99 frames"),
+            "input_part_03.mp4": (True, "ok"),
+        }
+        with patch.dict(
+            batched_pipeline.SETTINGS, {"final_output_folder": str(out_dir)}
+        ), patch(
+            "batched_pipeline.validate_part",
+            side_effect=lambda path, entry, tol: results[Path(path).name],
+        ):
+            invalid = batched_pipeline.validate_parts(manifest)
+            self.assertEqual([e["index"] for e in invalid], [1])
+            self.assertIsNotNone(manifest["parts"][0]["output_sha256"])
+
+            # An output changed after validation is caught by its checksum
+            (out_dir / "input_part_01.mp4").write_bytes(b"truncated")
+            invalid = batched_pipeline.validate_parts(manifest)
+            self.assertEqual([e["index"] for e in invalid], [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+try:
+    import numpy as np
+    from util import region_upscale
+except ImportError:  # numpy/Pillow are optional
+    np = None
+
+
+def nearest_upscale(src_dir, dst_dir, scale):
+    """Stand-in for waifu2x: nearest-neighbour upscale of every PNG."""
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    for png in Path(src_dir).glob("*.png"):
+        img = region_upscale.load_rgb(png)
+        up = img.repeat(scale, axis=0).repeat(scale, axis=1)
+        region_upscale.save_rgb(up, dst_dir / png.name)
+
+
+@unittest.skipIf(np is None, "numpy/Pillow not installed")
+class TestRegionUpscale(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.frames_dir = self.root / "frames"
+        self.frames_dir.mkdir()
+
+        rng = np.random.default_rng(0)
+        background = rng.integers(0, 255, (70, 100, 3), dtype=np.uint8)
+        self.frames = []
+        for i in range(6):
+            # scene cut at frame 3, "character" moving across both scenes
+            frame = background.copy() if i < 3 else 255 - background
+            frame[10:20, 5 + i * 5 : 15 + i * 5] = 255
+            self.frames.append(frame)
+        self.frames.append(self.frames[-1].copy())  # held frame
+        self.paths = []
+        for i, frame in enumerate(self.frames):
+            path = self.frames_dir / f"frame_{i+1:06d}.png"
+            region_upscale.save_rgb(frame, path)
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_changed_tiles(self):
+        a = self.frames[0]
+        b = a.copy()
+        b[33, 70] = b[33, 70] // 2 + 100
+        mask = region_upscale.changed_tiles(a, b, tile=32, threshold=0)
+        self.assertEqual(mask.shape, (3, 4))  # partial edge tiles included
+        self.assertEqual(list(zip(*np.nonzero(mask))), [(1, 2)])
+        self.assertFalse(region_upscale.changed_tiles(a, a, 32, 0).any())
+
+    def test_plan_and_composite_match_full_upscale(self):
+        crops = self.root / "crops"
+        upscaled = self.root / "upscaled"
+        output = self.root / "output"
+        plan = region_upscale.plan_regions(
+            self.paths, crops, tile=16, pad=4, threshold=0, refresh_interval=50
+        )
+        self.assertEqual([e["full"] for e in plan], [1, 0, 0, 1, 0, 0, 0])
+        self.assertTrue(0 < len(plan[1]["tiles"]) < 10)
+        self.assertEqual(plan[6]["tiles"], [])
+
+        nearest_upscale(crops, upscaled, 2)
+        stats = region_upscale.composite_regions(plan, upscaled, output, 2)
+        self.assertEqual(stats["unchanged"], 1)
+
+        for frame, path in zip(self.frames, self.paths):
+            result = region_upscale.load_rgb(output / path.name)
+            expected = frame.repeat(2, axis=0).repeat(2, axis=1)
+            np.testing.assert_array_equal(result, expected)
+
+    def test_refresh_interval_forces_full_frame(self):
+        # A full frame at least every `refresh_interval` frames, counting itself
+        for interval, expected in ((1, [True] * 3), (2, [True, False, True])):
+            plan = region_upscale.plan_regions(
+                self.paths[:3],
+                self.root / f"crops{interval}",
+                tile=16,
+                pad=4,
+                refresh_interval=interval,
+            )
+            self.assertEqual([e["full"] for e in plan], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
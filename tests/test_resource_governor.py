@@ -0,0 +1,59 @@
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from util import resource_governor
+
+
+class TestResourceGovernor(unittest.TestCase):
+
+    def test_parse_cpus(self):
+        self.assertEqual(resource_governor.parse_cpus("0-3,8-9"), {0, 1, 2, 3, 8, 9})
+        self.assertEqual(resource_governor.parse_cpus([1, "2"]), {1, 2})
+
+    @patch("util.resource_governor.shutil.which", return_value="/usr/bin/x")
+    @patch("util.resource_governor.os.sched_getaffinity", return_value={0, 1, 2, 3})
+    def test_governed_command_prefixes(self, mock_affinity, mock_which):
+        policy = {"cpus": "2-7", "nice": 10, "ionice": 2, "ionice_level": 7}
+        self.assertEqual(
+            resource_governor.governed_command(["ffmpeg", "-i", "x"], policy),
+            ["taskset", "-c", "2,3", "nice", "-n", "10", "ionice", "-c", "2",
+             "-n", "7", "ffmpeg", "-i", "x"],
+        )
+        self.assertEqual(
+            resource_governor.governed_command("echo hi", {"ionice": 3}, shell=True),
+            ["ionice", "-c", "3", "sh", "-c", "echo hi"],
+        )
+        self.assertEqual(resource_governor.governed_command(["ls"], None), ["ls"])
+
+    def test_run_governed_records_usage(self):
+        with tempfile.TemporaryDirectory() as td:
+            log = str(Path(td) / "usage.jsonl")
+            busy = [sys.executable, "-c", "sum(i * i for i in range(2000000))"]
+            usage = resource_governor.run_governed(
+                busy, "upscale", {"upscale": {"nice": 5}}, log, name="ep01"
+            )
+            self.assertGreater(usage["cpu_seconds"], 0)
+            self.assertEqual(usage["returncode"], 0)
+
+            with self.assertRaises(subprocess.CalledProcessError):
+                resource_governor.run_governed(
+                    [sys.executable, "-c", "raise SystemExit(3)"], "encode", {}, log
+                )
+            # Unknown stage is run but not logged
+            resource_governor.run_governed([sys.executable, "-c", "pass"], None, {}, log)
+
+            with open(log) as f:
+                records = [json.loads(line) for line in f]
+            self.assertEqual([r["stage"] for r in records], ["upscale", "encode"])
+            summary = resource_governor.summarize_usage(log)
+            self.assertEqual(summary["upscale"]["runs"], 1)
+            self.assertGreater(summary["upscale"]["avg_cores"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
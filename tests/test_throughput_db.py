@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from util import throughput_db
+
+
+class TestThroughputDb(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = str(Path(self.tmp.name) / "throughput.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_and_baseline(self):
+        setup = (
+            throughput_db.setup_mode("full", 500),
+            throughput_db.backend_signature([{"type": "ncnn"}], {"type": "ncnn"}),
+        )
+        key = ("upscale", 1, "models-upconv_7_anime_style_art_rgb", 2, (720, 576))
+        key += setup
+        self.assertIsNone(throughput_db.baseline_fps(self.db, *key))
+
+        for seconds in (100, 90, 110):
+            throughput_db.record(self.db, *key, frames=1000, seconds=seconds)
+        self.assertAlmostEqual(throughput_db.baseline_fps(self.db, *key), 10.0)
+
+        # Other GPU / resolution do not mix in
+        self.assertIsNone(
+            throughput_db.baseline_fps(self.db, "upscale", 0, *key[2:])
+        )
+        self.assertIsNone(
+            throughput_db.baseline_fps(self.db, *key[:4], (1920, 1080), *setup)
+        )
+        # Nor do other modes or backends
+        self.assertIsNone(
+            throughput_db.baseline_fps(
+                self.db, *key[:5], throughput_db.setup_mode("changed_regions", 500),
+                setup[1],
+            )
+        )
+        cpu_assisted = throughput_db.backend_signature(
+            [{"type": "ncnn"}, {"type": "cpu", "share": 1}], {"type": "ncnn"}
+        )
+        self.assertIsNone(
+            throughput_db.baseline_fps(self.db, *key[:6], cpu_assisted)
+        )
+
+    def test_simulate_makespan_uses_first_free_gpu(self):
+        # 4 pieces of 100 frames, GPU0 twice as fast: GPU0 takes 3, GPU1 takes 1
+        makespan = throughput_db.simulate_makespan(400, 4, [2.0, 1.0], 0)
+        self.assertAlmostEqual(makespan, 150.0)
+
+    def test_choose_pieces_balances_uneven_gpus(self):
+        pieces, makespan = throughput_db.choose_pieces(
+            30000, [10.0, 5.0], min_pieces=2, overhead_seconds=10
+        )
+        # 2 equal pieces would leave the fast GPU idle half the time
+        self.assertGreater(pieces, 2)
+        self.assertLess(
+            makespan, throughput_db.simulate_makespan(30000, 2, [10.0, 5.0], 10)
+        )
+
+    def test_choose_pieces_respects_shm_minimum(self):
+        pieces, _ = throughput_db.choose_pieces(
+            1000, [10.0, 10.0], min_pieces=10, overhead_seconds=1000
+        )
+        self.assertEqual(pieces, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import tune_pipeline
+from util import tuning_profile
+
+
+class TestTuningProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_png_size_reads_ihdr(self):
+        png = self.dir / "frame_000001.png"
+        png.write_bytes(
+            b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR"
+            + struct.pack(">II", 720, 576) + b"\x08\x02\x00\x00\x00"
+        )
+        self.assertEqual(tuning_profile.png_size(str(png)), (720, 576))
+
+        not_png = self.dir / "frame.jpg"
+        not_png.write_bytes(b"\xff\xd8" + b"\x00" * 30)
+        with self.assertRaises(ValueError):
+            tuning_profile.png_size(str(not_png))
+
+    def test_choose_best_skips_failed_trials(self):
+        trials = [
+            {"tile": 400, "threads": "4:4:8", "seconds": 1.0, "frames": 10, "ok": False},
+            {"tile": 200, "threads": "2:2:4", "seconds": 2.0, "frames": 10, "ok": True},
+            {"tile": 0, "threads": "2:1:9", "seconds": 4.0, "frames": 10, "ok": True},
+        ]
+        best = tuning_profile.choose_best(trials)
+        self.assertEqual((best["tile"], best["threads"]), (200, "2:2:4"))
+        self.assertAlmostEqual(best["fps"], 5.0)
+        self.assertIsNone(tuning_profile.choose_best(trials[:1]))
+
+    def test_time_marginal_subtracts_startup_run(self):
+        frames_dir = self.dir / "frames"
+        frames_dir.mkdir()
+        for i in range(5):
+            (frames_dir / f"frame_{i:06d}.png").write_bytes(b"png")
+        base_dir = tune_pipeline.link_subset(frames_dir, self.dir / "base", 1)
+        self.assertEqual([p.name for p in base_dir.iterdir()], ["frame_000000.png"])
+
+        def copy_cmd(input_dir, output_dir):
+            return ["sh", "-c", f"cp {input_dir}/*.png {output_dir}/"]
+
+        # 1 frame: 5s (all startup), 5 frames: 7s -> 4 extra frames in 2s
+        with patch("tune_pipeline.time.time", side_effect=[0, 5, 10, 17]):
+            seconds, frames, ok = tune_pipeline.time_marginal(
+                copy_cmd, frames_dir, base_dir, self.dir / "out"
+            )
+        self.assertEqual((seconds, frames, ok), (2, 4, True))
+
+    def test_profile_roundtrip_and_lookup(self):
+        path = str(self.dir / "tuning_profile.json")
+        self.assertEqual(tuning_profile.load_profile(path), {})
+
+        key = tuning_profile.profile_key(
+            1, "waifu2x", "models-upconv_7_anime_style_art_rgb", (720, 576)
+        )
+        tuning_profile.save_profile(path, {key: {"threads": "2:2:4", "tile": 200}})
+        profile = tuning_profile.load_profile(path)
+
+        entry = tuning_profile.lookup(
+            profile, "1", "waifu2x", "models-upconv_7_anime_style_art_rgb", (720, 576)
+        )
+        self.assertEqual(entry, {"threads": "2:2:4", "tile": 200})
+        self.assertIsNone(
+            tuning_profile.lookup(
+                profile, 0, "waifu2x", "models-upconv_7_anime_style_art_rgb", (720, 576)
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
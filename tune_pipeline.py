@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Find the fastest waifu2x tile size (-t) and waifu2x/RIFE thread counts (-j)
+for every configured GPU by timing short runs on sample frames.
+
+Each CLI run pays model load and Vulkan pipeline compilation, so a discarded
+warm-up run fills the shader cache first and every candidate is timed as a
+run on all sample frames minus a run on the first one (two for RIFE). That
+difference is the per-frame cost the pipeline actually sees.
+
+Usage: python tune_pipeline.py <input.mp4> [sample_frames]
+
+Winners are stored in SETTINGS["tuning_profile"] and picked up automatically
+by upscale_frames / interpolate_frames for the same GPU, model and resolution.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from backends import NcnnBackend
+from settings import SETTINGS
+from util.estimate_png_frames_size import _probe
+from util.tuning_profile import (
+    choose_best,
+    load_profile,
+    png_size,
+    profile_key,
+    save_profile,
+)
+
+
+def extract_sample_frames(video_path, out_dir, count):
+    duration = _probe(str(video_path))["duration_seconds"]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-ss",
+            str(duration / 2),  # middle of the video, skip intros/black frames
+            "-i",
+            str(video_path),
+            "-frames:v",
+            str(count),
+            str(out_dir / "frame_%06d.png"),
+        ],
+        check=True,
+    )
+    return sorted(out_dir.glob("*.png"))
+
+
+def time_trial(cmd, output_dir):
+    shutil.rmtree(output_dir, ignore_errors=True)
+    output_dir.mkdir(parents=True)
+    start = time.time()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    seconds = time.time() - start
+    # ncnn tools may exit 0 after a failed tile allocation, so also check output
+    ok = result.returncode == 0 and any(output_dir.glob("*.png"))
+    return seconds, ok
+
+
+def link_subset(frames_dir, subset_dir, count):
+    """Folder with hard links to the first `count` frames of frames_dir."""
+    subset_dir.mkdir(parents=True, exist_ok=True)
+    for frame in sorted(frames_dir.glob("*.png"))[:count]:
+        os.link(frame, subset_dir / frame.name)
+    return subset_dir
+
+
+def time_marginal(make_cmd, frames_dir, base_dir, output_dir):
+    """
+    Time a run on frames_dir minus a run on base_dir with the same settings.
+    Returns (seconds, output frames, ok) for the extra frames only, so model
+    load and pipeline compilation cancel out.
+    """
+    base_seconds, base_ok = time_trial(make_cmd(base_dir, output_dir), output_dir)
+    base_frames = len(list(output_dir.glob("*.png")))
+    seconds, ok = time_trial(make_cmd(frames_dir, output_dir), output_dir)
+    frames = len(list(output_dir.glob("*.png")))
+    return seconds - base_seconds, frames - base_frames, ok and base_ok
+
+
+def warm_up(cmd, output_dir):
+    """Discarded run so the first candidate doesn't pay the shader cache warm-up."""
+    seconds, _ = time_trial(cmd, output_dir)
+    print(f"  warm-up: {seconds:.2f}s (discarded)")
+
+
+def tune_waifu2x(gpu, frames_dir, base_dir, output_dir):
+    warm_up(NcnnBackend(gpu=gpu).upscale_command(base_dir, output_dir), output_dir)
+    trials = []
+    for tile in SETTINGS["tuning_tile_sizes"]:
+        for threads in SETTINGS["tuning_threads"]:
+            backend = NcnnBackend(gpu=gpu, threads=threads, tile=tile)
+            seconds, frames, ok = time_marginal(
+                backend.upscale_command, frames_dir, base_dir, output_dir
+            )
+            print(
+                f"  waifu2x gpu{gpu} -t {tile} -j {threads}: "
+                f"{seconds:.2f}s for {frames} frames {'✅' if ok else '❌'}"
+            )
+            trials.append(
+                {
+                    "tile": tile,
+                    "threads": threads,
+                    "seconds": seconds,
+                    "frames": frames,
+                    "ok": ok,
+                }
+            )
+    return choose_best(trials)
+
+
+def tune_rife(gpu, frames_dir, base_dir, output_dir):
+    warm_up(NcnnBackend(gpu=gpu).interpolate_command(base_dir, output_dir), output_dir)
+    trials = []
+    for threads in SETTINGS["tuning_threads"]:
+        backend = NcnnBackend(gpu=gpu, threads=threads)
+        seconds, frames, ok = time_marginal(
+            backend.interpolate_command, frames_dir, base_dir, output_dir
+        )
+        print(
+            f"  rife gpu{gpu} -j {threads}: "
+            f"{seconds:.2f}s for {frames} frames {'✅' if ok else '❌'}"
+        )
+        # rife has no tile size option
+        trials.append(
+            {
+                "tile": None,
+                "threads": threads,
+                "seconds": seconds,
+                "frames": frames,
+                "ok": ok,
+            }
+        )
+    return choose_best(trials)
+
+
+def tune(video_path, sample_frames=30):
+    profile = load_profile(SETTINGS["tuning_profile"])
+    with tempfile.TemporaryDirectory(dir=SETTINGS["working_dir_base"]) as td:
+        td = Path(td)
+        frames_dir = td / "frames"
+        upscaled_dir = td / "output"
+        interpolated_dir = td / "interpolated"
+        frames = extract_sample_frames(video_path, frames_dir, sample_frames)
+        if len(frames) < 3:
+            raise RuntimeError(f"Could not extract sample frames from {video_path}")
+        src_size = png_size(frames[0])
+        base_dir = link_subset(frames_dir, td / "base_frames", 1)
+
+        for gpu in range(SETTINGS["gpus_used_count"]):
+            print(f"▶️ Tuning waifu2x on GPU {gpu} at {src_size[0]}x{src_size[1]}")
+            best = tune_waifu2x(gpu, frames_dir, base_dir, upscaled_dir)
+            if best:
+                key = profile_key(gpu, "waifu2x", SETTINGS["waifu_model"], src_size)
+                profile[key] = dict(best, tuned=time.strftime("%Y-%m-%d %H:%M:%S"))
+                print(
+                    f"🏆 {key}: -t {best['tile']} -j {best['threads']} "
+                    f"({best['fps']:.2f} fps)"
+                )
+            else:
+                print(f"⚠️ No working waifu2x settings on GPU {gpu}")
+                continue
+
+            # RIFE runs on upscaled frames, so tune it at that resolution
+            tune_output = list(upscaled_dir.glob("*.png"))
+            if len(tune_output) < 3:
+                continue
+            up_size = png_size(tune_output[0])
+            upscaled_base_dir = td / f"base_upscaled_gpu{gpu}"
+            shutil.rmtree(upscaled_base_dir, ignore_errors=True)
+            link_subset(upscaled_dir, upscaled_base_dir, 2)  # rife needs a pair
+            print(f"▶️ Tuning RIFE on GPU {gpu} at {up_size[0]}x{up_size[1]}")
+            best = tune_rife(gpu, upscaled_dir, upscaled_base_dir, interpolated_dir)
+            if best:
+                key = profile_key(gpu, "rife", SETTINGS["rife_model"], up_size)
+                profile[key] = dict(best, tuned=time.strftime("%Y-%m-%d %H:%M:%S"))
+                print(f"🏆 {key}: -j {best['threads']} ({best['fps']:.2f} fps)")
+            else:
+                print(f"⚠️ No working RIFE settings on GPU {gpu}")
+
+    save_profile(SETTINGS["tuning_profile"], profile)
+    print(f"✅ Tuning profile saved to {SETTINGS['tuning_profile']}")
+    return profile
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: tune_pipeline.py <input.mp4> [sample_frames]")
+        sys.exit(1)
+    tune(Path(sys.argv[1]), int(sys.argv[2]) if len(sys.argv) > 2 else 30)
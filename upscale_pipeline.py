@@ -2,11 +2,17 @@
 
 import os
 import json
+import shutil
 import subprocess
 from pathlib import Path
 import time
 import sys
 from settings import SETTINGS
+from backends import make_backend, upscale_shared
+from util import throughput_db
+from util.frame_windows import FrameRefs, plan_windows
+from util.resource_governor import run_governed, start_governed, wait_governed
+from util.tuning_profile import load_profile, lookup, png_size
 
 
 if len(sys.argv) < 2:
@@ -62,18 +68,133 @@ def save_progress(progress):
         json.dump(progress, f, indent=2)
 
 
+STAGE_SCRIPTS = {
+    "0_extract_dvd_to_mp4.sh": "preprocess",
+    "1_preprocess_mp4.sh": "preprocess",
+    "2_extract_frames.sh": "extract",
+    "3_encode_final_mp4.sh": "encode",
+}
+
+
+def command_stage(cmd):
+    """Pipeline stage of an external command, for its resource policy."""
+    if not isinstance(cmd, list) or not cmd:
+        return None
+    if cmd[0] == SETTINGS["waifu2x_path"]:
+        return "upscale"
+    if cmd[0] == SETTINGS["rife_path"]:
+        return "interpolate"
+    for part in cmd[:2]:
+        stage = STAGE_SCRIPTS.get(Path(str(part)).name)
+        if stage:
+            return stage
+    return None
+
+
 def run_command(cmd, shell=False, hide_output=False):
+    stage = command_stage(cmd)
+    kwargs = {}
     if hide_output:
-        subprocess.run(
-            cmd,
-            shell=shell,
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
     else:
         print(f"▶️ Running: {' '.join(cmd) if isinstance(cmd, list) else cmd}")
-        subprocess.run(cmd, shell=shell, check=True)
+    usage = run_governed(
+        cmd,
+        stage,
+        SETTINGS.get("stage_resources"),
+        SETTINGS.get("resource_log"),
+        shell=shell,
+        name=SETTINGS["file_name"],
+        **kwargs,
+    )
+    if stage and not hide_output:
+        print(
+            f"🧮 {stage}: {usage['cpu_seconds']:.1f} CPU-s in {usage['wall_seconds']:.1f}s "
+            f"({usage['avg_cores']:.2f} of {usage['allowed_cpus']} cores, "
+            f"{usage['involuntary_switches']} involuntary switches)"
+        )
+
+
+def tuned_backend(spec, tool, model, frames_dir):
+    """Backend for `spec`, with the tuned threads/tile of that backend's own GPU."""
+    threads = tile = None
+    if spec.get("type", "ncnn") == "ncnn":
+        gpu = spec.get("gpu", SETTINGS["primary_gpu"])
+        threads, tile = tuned_params(tool, model, frames_dir, gpu)
+        if str(gpu) == "-1":
+            tile = None  # GPU tile sizes don't apply to ncnn on CPU
+    return make_backend(spec, threads, tile, run=run_command)
+
+
+def upscale_backends(frames_dir):
+    return [
+        tuned_backend(spec, "waifu2x", SETTINGS["waifu_model"], frames_dir)
+        for spec in SETTINGS["upscale_backends"]
+    ]
+
+
+def interpolate_backend(frames_dir):
+    return tuned_backend(
+        SETTINGS["interpolate_backend"],
+        "rife",
+        SETTINGS.get("rife_model", "rife-anime"),
+        frames_dir,
+    )
+
+
+def tuned_params(tool, model, frames_dir, gpu=None):
+    """Return (threads, tile) from the tuning profile, or the configured defaults."""
+    gpu = SETTINGS["primary_gpu"] if gpu is None else gpu
+    first_frame = next(iter(Path(frames_dir).glob("*.png")), None)
+    if first_frame is not None:
+        profile = load_profile(SETTINGS["tuning_profile"])
+        entry = lookup(profile, gpu, tool, model, png_size(first_frame))
+        if entry:
+            return entry["threads"], entry.get("tile")
+    return SETTINGS["threads"], None
+
+
+def measure_frames(frames_dir):
+    """Return (frame count, (width, height)) of a PNG folder."""
+    frames = list(Path(frames_dir).glob("*.png"))
+    return len(frames), (png_size(frames[0]) if frames else (0, 0))
+
+
+def setup_key():
+    """(mode, backends) part of the throughput history key for this configuration."""
+    return (
+        throughput_db.setup_mode(
+            SETTINGS.get("upscale_mode", "full"), SETTINGS.get("window_frames")
+        ),
+        throughput_db.backend_signature(
+            SETTINGS["upscale_backends"], SETTINGS["interpolate_backend"]
+        ),
+    )
+
+
+def record_throughput(stage, model, frames, size, seconds):
+    """Store measured fps and warn if it is well below this setup's history."""
+    if not frames:
+        return
+    key = (
+        stage,
+        SETTINGS["primary_gpu"],
+        model,
+        SETTINGS["scale"],
+        size,
+        *setup_key(),
+    )
+    baseline = throughput_db.baseline_fps(SETTINGS["throughput_db"], *key)
+    fps = throughput_db.record(
+        SETTINGS["throughput_db"], *key, frames, seconds, name=SETTINGS["file_name"]
+    )
+    print(f"📈 {stage}: {frames} frames in {seconds:.1f}s ({fps:.2f} fps)")
+    if baseline and fps < baseline * (1 - SETTINGS["throughput_warn_drop"]):
+        print(
+            f"⚠️ {stage} on GPU {SETTINGS['primary_gpu']} is {fps:.2f} fps, "
+            f"{100 * (1 - fps / baseline):.0f}% below its baseline of "
+            f"{baseline:.2f} fps. Thermal throttling or driver regression?"
+        )
 
 
 # === STEP 1: Extract DVD to MP4 ===
@@ -92,30 +213,53 @@ def extract_frames():
 
 
 # === STEP 3: Upscale Frames in Batches ===
+def upscale_changed_regions(input_dir, output_dir, backends):
+    # numpy/Pillow are only needed for this mode
+    from util.region_upscale import plan_regions, composite_regions
+
+    crops_dir = Path(SETTINGS["working_dir"]) / "region_crops"
+    upscaled_crops_dir = Path(SETTINGS["working_dir"]) / "region_upscaled"
+    upscaled_crops_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"▶️ Finding changed regions: {input_dir}")
+    plan = plan_regions(
+        sorted(input_dir.glob("*.png")),
+        crops_dir,
+        tile=SETTINGS["region_tile_size"],
+        pad=SETTINGS["region_tile_padding"],
+        threshold=SETTINGS["region_threshold"],
+        refresh_interval=SETTINGS["region_refresh_interval"],
+        scene_cut_fraction=SETTINGS["region_scene_cut_fraction"],
+    )
+
+    print(f"▶️ Upscaling changed regions: {crops_dir} → {upscaled_crops_dir}")
+    upscale_shared(backends, crops_dir, upscaled_crops_dir)
+    run_command(["rm", "-rf", str(crops_dir)])
+
+    stats = composite_regions(plan, upscaled_crops_dir, output_dir, SETTINGS["scale"])
+    run_command(["rm", "-rf", str(upscaled_crops_dir)])
+    print(
+        f"🧩 {stats['frames']} frames: {stats['full']} full refreshes, "
+        f"{stats['tiles']} tiles, {stats['unchanged']} unchanged"
+    )
+
+
 def upscale_frames():
     input_dir = Path(SETTINGS["working_dir"]) / "frames"
     output_dir = Path(SETTINGS["working_dir"]) / "output"
     output_dir.mkdir(parents=True, exist_ok=True)
+    backends = upscale_backends(input_dir)
+    frames, size = measure_frames(input_dir)
+    start = time.time()
 
-    cmd = [
-        SETTINGS["waifu2x_path"],
-        "-i",
-        str(input_dir),
-        "-o",
-        str(output_dir),
-        "-n",
-        str(SETTINGS["noise"]),
-        "-s",
-        str(SETTINGS["scale"]),
-        "-m",
-        SETTINGS["waifu_model"],
-        "-g",
-        str(SETTINGS["primary_gpu"]),
-        "-j",
-        str(SETTINGS["threads"]),
-    ]
-    print(f"▶️ Upscaling entire folder: {input_dir} → {output_dir}")
-    run_command(cmd, hide_output=False)  # Show output for debugging
+    if SETTINGS.get("upscale_mode") == "changed_regions":
+        upscale_changed_regions(input_dir, output_dir, backends)
+    else:
+        print(f"▶️ Upscaling entire folder: {input_dir} → {output_dir} with {backends}")
+        upscale_shared(backends, input_dir, output_dir)
+    record_throughput(
+        "upscale", SETTINGS["waifu_model"], frames, size, time.time() - start
+    )
 
     run_command(["rm", "-rf", str(input_dir)])
     print("✅ Folder upscaling complete.")
@@ -126,22 +270,18 @@ def interpolate_frames():
     input_dir = Path(SETTINGS["working_dir"]) / "output"
     output_dir = Path(SETTINGS["working_dir"]) / "interpolated"
     output_dir.mkdir(parents=True, exist_ok=True)
-
-    cmd = [
-        SETTINGS["rife_path"],
-        "-i",
-        str(input_dir),
-        "-o",
-        str(output_dir),
-        "-m",
+    backend = interpolate_backend(input_dir)
+    frames, size = measure_frames(input_dir)
+    start = time.time()
+    print(f"▶️ Interpolating entire folder: {input_dir} → {output_dir} with {backend}")
+    backend.interpolate(input_dir, output_dir)
+    record_throughput(
+        "interpolate",
         SETTINGS.get("rife_model", "rife-anime"),
-        "-g",
-        str(SETTINGS["primary_gpu"]),
-        "-j",
-        str(SETTINGS["threads"]),
-    ]
-    print(f"▶️ Interpolating entire folder: {input_dir} → {output_dir}")
-    run_command(cmd, hide_output=False)  # Show output for debugging
+        frames,
+        size,
+        time.time() - start,
+    )
 
     print("✅ Folder interpolation complete.")
 
@@ -159,6 +299,123 @@ def encode_video():
     )
 
 
+# === OR 3-5: Upscale, interpolate and encode in rolling windows ===
+def start_encoder():
+    cmd = [
+        "bash",
+        "3_encode_final_mp4.sh",
+        SETTINGS["input_path"],
+        SETTINGS["final_encoder"],
+        SETTINGS["final_output_folder"],
+        "pipe",
+    ]
+    print(f"▶️ Running: {' '.join(cmd)}")
+    return start_governed(
+        cmd, "encode", SETTINGS.get("stage_resources"), stdin=subprocess.PIPE
+    )
+
+
+def process_windows():
+    """
+    Upscale and interpolate window by window and stream the result into the
+    encoder. Source frames are deleted once upscaled, upscaled frames once
+    every RIFE window reading them is done (the first frame of a window is
+    also the last input of the previous one) and interpolated frames once
+    piped, so only a few windows of frames exist at a time.
+    """
+    work = Path(SETTINGS["working_dir"])
+    frames_dir = work / "frames"
+    output_dir = work / "output"
+    upscale_in = work / "window_frames"
+    rife_in = work / "window_upscaled"
+    rife_out = work / "window_interpolated"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    frames = sorted(frames_dir.glob("*.png"))
+    windows = plan_windows(len(frames), SETTINGS["window_frames"])
+    frame_count, size = measure_frames(frames_dir)
+    backends = upscale_backends(frames_dir)
+    refs = FrameRefs()
+    timings = {"upscale": 0.0, "interpolate": 0.0}
+    upscaled_size = None
+
+    def upscale_window(k):
+        start, end = windows[k]
+        upscale_in.mkdir(parents=True, exist_ok=True)
+        for frame in frames[start:end]:
+            os.rename(frame, upscale_in / frame.name)
+        t = time.time()
+        if SETTINGS.get("upscale_mode") == "changed_regions":
+            upscale_changed_regions(upscale_in, output_dir, backends)
+        else:
+            upscale_shared(backends, upscale_in, output_dir)
+        timings["upscale"] += time.time() - t
+        shutil.rmtree(upscale_in)
+        for i in range(start, end):
+            # Window starts are also read by the previous RIFE window
+            refs.add(output_dir / frames[i].name, 2 if i == start and k > 0 else 1)
+
+    encoder = start_encoder()
+    try:
+        print(f"▶️ Processing {len(frames)} frames in {len(windows)} windows")
+        if windows:
+            upscale_window(0)
+        for k, (start, end) in enumerate(windows):
+            has_next = k + 1 < len(windows)
+            if has_next:
+                upscale_window(k + 1)
+            inputs = [output_dir / f.name for f in frames[start : end + has_next]]
+            if upscaled_size is None:
+                upscaled_size = png_size(inputs[0])
+                rife = interpolate_backend(output_dir)
+
+            rife_in.mkdir(parents=True, exist_ok=True)
+            rife_out.mkdir(parents=True, exist_ok=True)
+            for path in inputs:
+                os.link(path, rife_in / path.name)
+            t = time.time()
+            rife.interpolate(rife_in, rife_out)
+            timings["interpolate"] += time.time() - t
+            shutil.rmtree(rife_in)
+            for path in inputs:
+                refs.release(path)
+
+            # RIFE gives 2 frames per input; the lookahead frame's pair
+            # belongs to the next window
+            interpolated = sorted(rife_out.glob("*.png"))
+            expected = 2 * (end - start)
+            if len(interpolated) < expected:
+                raise RuntimeError(
+                    f"RIFE wrote {len(interpolated)} frames for window {k + 1}, "
+                    f"expected {expected}"
+                )
+            for path in interpolated[:expected]:
+                encoder.stdin.write(path.read_bytes())
+            shutil.rmtree(rife_out)
+            print(f"🪟 Window {k + 1}/{len(windows)} done ({end}/{len(frames)} frames)")
+
+        encoder.stdin.close()
+        wait_governed(encoder, SETTINGS.get("resource_log"), SETTINGS["file_name"])
+    except BaseException:
+        encoder.kill()
+        encoder.wait()
+        raise
+
+    record_throughput(
+        "upscale", SETTINGS["waifu_model"], frame_count, size, timings["upscale"]
+    )
+    if upscaled_size:
+        record_throughput(
+            "interpolate",
+            SETTINGS.get("rife_model", "rife-anime"),
+            frame_count,
+            upscaled_size,
+            timings["interpolate"],
+        )
+    run_command(["rm", "-rf", str(frames_dir), str(output_dir)])
+    print("✅ Windowed upscale, interpolation and encode complete.")
+
+
 # === MAIN ===
 if __name__ == "__main__":
     import sys
@@ -172,6 +429,8 @@ if __name__ == "__main__":
         SETTINGS["primary_gpu"] = sys.argv[2]
     elif os.environ.get("GPU"):
         SETTINGS["primary_gpu"] = os.environ["GPU"]
+    if len(sys.argv) > 3:
+        SETTINGS["final_output_folder"] = sys.argv[3]
 
     SETTINGS["input_path"] = sys.argv[1]
     NAME = Path(SETTINGS["input_path"]).stem
@@ -184,12 +443,26 @@ if __name__ == "__main__":
     # extract_dvd()
     preprocess_mp4()
     extract_frames()
-    upscale_frames()
-    interpolate_frames()
-    encode_video()
+    frames, size = measure_frames(Path(SETTINGS["working_dir"]) / "frames")
+    if SETTINGS.get("window_frames"):
+        process_windows()
+    else:
+        upscale_frames()
+        interpolate_frames()
+        encode_video()
 
     task_end = time.time()
     elapsed = task_end - task_start
+    # Whole-part throughput, used by batched_pipeline for ETA and piece count
+    record_throughput(
+        "total",
+        throughput_db.model_key(
+            SETTINGS["waifu_model"], SETTINGS.get("rife_model", "rife-anime")
+        ),
+        frames,
+        size,
+        elapsed,
+    )
 
     hours, remainder = divmod(int(elapsed), 3600)
     minutes, seconds = divmod(remainder, 60)
@@ -0,0 +1,206 @@
+"""
+Read DVD-Video titles straight out of an ISO image, without extracting it.
+
+DVD-Video discs carry a UDF/ISO9660 bridge filesystem, so the VIDEO_TS files
+are always reachable through the ISO9660 directory tree. Each VOB is a single
+contiguous extent, which lets us stream the main title's VOBs into ffmpeg by
+reading byte ranges from the image.
+
+CLI (title bytes go to stdout, info to stderr):
+    python util/dvd_iso.py <input.iso> [vts_number] | ffmpeg -i pipe:0 ...
+"""
+
+import re
+import struct
+import sys
+from typing import Dict, List, Optional, Any
+
+SECTOR = 2048
+CHUNK = 4 * 1024 * 1024
+
+
+def _read_sector(f, lba: int, count: int = 1) -> bytes:
+    f.seek(lba * SECTOR)
+    return f.read(count * SECTOR)
+
+
+def _parse_directory(f, lba: int, size: int) -> List[Dict[str, Any]]:
+    """Parse ISO9660 directory records of one directory extent."""
+    data = _read_sector(f, lba, (size + SECTOR - 1) // SECTOR)[:size]
+    entries = []
+    pos = 0
+    while pos < len(data):
+        rec_len = data[pos]
+        if rec_len == 0:
+            # Records never span sectors; skip the padding to the next one
+            pos = (pos // SECTOR + 1) * SECTOR
+            continue
+        extent = struct.unpack_from("<I", data, pos + 2)[0]
+        length = struct.unpack_from("<I", data, pos + 10)[0]
+        flags = data[pos + 25]
+        name_len = data[pos + 32]
+        raw_name = data[pos + 33 : pos + 33 + name_len]
+        if raw_name not in (b"\x00", b"\x01"):
+            name = raw_name.decode("ascii", "replace").split(";")[0].rstrip(".")
+            entries.append(
+                {
+                    "name": name.upper(),
+                    "lba": extent,
+                    "size": length,
+                    "is_dir": bool(flags & 0x02),
+                }
+            )
+        pos += rec_len
+    return entries
+
+
+def list_video_ts(iso_path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Return {file name: {"lba", "size"}} for every file in VIDEO_TS.
+    Raises ValueError if the image has no ISO9660 VIDEO_TS directory.
+    """
+    with open(iso_path, "rb") as f:
+        pvd = _read_sector(f, 16)
+        if pvd[0] != 1 or pvd[1:6] != b"CD001":
+            raise ValueError(f"No ISO9660 primary volume descriptor in {iso_path}")
+        block_size = struct.unpack_from("<H", pvd, 128)[0]
+        if block_size != SECTOR:
+            raise ValueError(f"Unsupported ISO9660 block size {block_size}")
+        root = pvd[156 : 156 + 34]
+        root_lba = struct.unpack_from("<I", root, 2)[0]
+        root_size = struct.unpack_from("<I", root, 10)[0]
+
+        video_ts = next(
+            (
+                e
+                for e in _parse_directory(f, root_lba, root_size)
+                if e["is_dir"] and e["name"] == "VIDEO_TS"
+            ),
+            None,
+        )
+        if video_ts is None:
+            raise ValueError(f"No VIDEO_TS directory in {iso_path}")
+        return {
+            e["name"]: {"lba": e["lba"], "size": e["size"]}
+            for e in _parse_directory(f, video_ts["lba"], video_ts["size"])
+            if not e["is_dir"]
+        }
+
+
+def _bcd(byte: int) -> int:
+    return (byte >> 4) * 10 + (byte & 0x0F)
+
+
+def _ifo_longest_pgc_seconds(ifo: bytes) -> float:
+    """Longest program chain playback time in a VTS_xx_0.IFO, in seconds."""
+    if not ifo.startswith(b"DVDVIDEO-VTS"):
+        return 0.0
+    pgci = struct.unpack_from(">I", ifo, 0xCC)[0] * SECTOR
+    if pgci == 0 or pgci + 8 > len(ifo):
+        return 0.0
+    count = struct.unpack_from(">H", ifo, pgci)[0]
+    longest = 0.0
+    for i in range(count):
+        entry = pgci + 8 + i * 8
+        if entry + 8 > len(ifo):
+            break
+        pgc = pgci + struct.unpack_from(">I", ifo, entry + 4)[0]
+        if pgc + 8 > len(ifo):
+            continue
+        hh, mm, ss, ff = ifo[pgc + 4 : pgc + 8]
+        fps = 30.0 if (ff >> 6) == 3 else 25.0
+        seconds = _bcd(hh) * 3600 + _bcd(mm) * 60 + _bcd(ss) + _bcd(ff & 0x3F) / fps
+        longest = max(longest, seconds)
+    return longest
+
+
+def list_titles(iso_path: str) -> List[Dict[str, Any]]:
+    """
+    List title sets (VTS) in the image with their title VOB extents.
+
+    Returns a list of dicts with:
+      - vts (int), duration_seconds (longest PGC from the IFO, 0 if unknown)
+      - size_bytes (sum of title VOBs)
+      - vobs: [{"name", "lba", "size"}] in play order (VTS_xx_1.VOB, _2, ...)
+    """
+    files = list_video_ts(iso_path)
+    titles = {}
+    for name, ext in files.items():
+        m = re.fullmatch(r"VTS_(\d{2})_(\d)\.VOB", name)
+        if m and m.group(2) != "0":  # _0 is the menu VOB
+            titles.setdefault(int(m.group(1)), []).append(dict(ext, name=name))
+
+    result = []
+    with open(iso_path, "rb") as f:
+        for vts, vobs in sorted(titles.items()):
+            vobs.sort(key=lambda v: v["name"])
+            duration = 0.0
+            ifo = files.get(f"VTS_{vts:02d}_0.IFO")
+            if ifo:
+                f.seek(ifo["lba"] * SECTOR)
+                duration = _ifo_longest_pgc_seconds(f.read(ifo["size"]))
+            result.append(
+                {
+                    "vts": vts,
+                    "duration_seconds": duration,
+                    "size_bytes": sum(v["size"] for v in vobs),
+                    "vobs": vobs,
+                }
+            )
+    return result
+
+
+def main_title(iso_path: str) -> Dict[str, Any]:
+    """Pick the title set with the longest playback (size breaks ties/unknowns)."""
+    titles = list_titles(iso_path)
+    if not titles:
+        raise ValueError(f"No title VOBs found in {iso_path}")
+    return max(titles, key=lambda t: (t["duration_seconds"], t["size_bytes"]))
+
+
+def stream_title(iso_path: str, out, vts: Optional[int] = None) -> int:
+    """
+    Write the title VOBs of `vts` (default: main title) to the binary stream `out`,
+    reading their extents directly from the image. Returns bytes written.
+    """
+    if vts is None:
+        title = main_title(iso_path)
+    else:
+        title = next((t for t in list_titles(iso_path) if t["vts"] == vts), None)
+        if title is None:
+            raise ValueError(f"VTS {vts} not found in {iso_path}")
+
+    written = 0
+    with open(iso_path, "rb") as f:
+        for vob in title["vobs"]:
+            f.seek(vob["lba"] * SECTOR)
+            remaining = vob["size"]
+            while remaining > 0:
+                chunk = f.read(min(CHUNK, remaining))
+                if not chunk:
+                    raise ValueError(f"{vob['name']} extends past end of image")
+                out.write(chunk)
+                remaining -= len(chunk)
+                written += len(chunk)
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <input.iso> [vts_number]", file=sys.stderr)
+        sys.exit(1)
+
+    iso = sys.argv[1]
+    for t in list_titles(iso):
+        print(
+            f"VTS {t['vts']:02d}: {t['duration_seconds'] / 60:.1f} min, "
+            f"{len(t['vobs'])} VOBs, {t['size_bytes'] / 1024**3:.2f} GB",
+            file=sys.stderr,
+        )
+    vts = int(sys.argv[2]) if len(sys.argv) > 2 else main_title(iso)["vts"]
+    print(f"▶️ Streaming VTS {vts:02d}", file=sys.stderr)
+    try:
+        stream_title(iso, sys.stdout.buffer, vts)
+        sys.stdout.buffer.flush()
+    except BrokenPipeError:
+        sys.exit(1)
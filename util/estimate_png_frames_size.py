@@ -193,18 +193,26 @@ def plan_chunks_for_shm(
     assumed_png_ratio: float = 0.5,
     shm_path: str = "/dev/shm",
     verbose: bool = False,
+    window_frames: int = 0,
+    scale: int = 2,
 ):
     """
     Plan how many pieces to cut the video into so that PNG frames for each piece
     fit into /dev/shm, assuming you need `safety_multiplier` × frames size
     available in shm (default 1.5x).
 
+    With `window_frames` > 0 (rolling windows) upscaled and interpolated frames
+    never exist for a whole piece: peak use is the piece's frames plus two
+    upscaled windows and one interpolated window (2 frames per input), all at
+    `scale`. `safety_multiplier` then covers that total instead.
+
     Returns a dict with:
       - shm_total_bytes, shm_available_bytes
       - estimated_total_bytes (PNG), avg_frame_size_bytes
       - allowed_bytes_per_chunk (PNG payload per chunk)
       - frames_per_chunk, seconds_per_chunk
-      - num_chunks, total_frames, fps, duration_seconds
+      - num_chunks, total_frames, width, height, fps, duration_seconds
+      - window_bytes (fixed per-chunk shm use of rolling windows, 0 without)
     """
     # 1) Size estimate (reuses probe+sampling/heuristic)
     est = estimate_png_frames_size(
@@ -220,16 +228,21 @@ def plan_chunks_for_shm(
     if shm_avail <= 0:
         raise RuntimeError(f"No available space on {shm_path}")
 
+    avg_frame = est["avg_frame_size_bytes"]
+
     # 3) How many PNG bytes can a single chunk use?
-    # Need safety_multiplier * (chunk_png_bytes) <= shm_avail
-    allowed_bytes_per_chunk = math.floor(shm_avail / safety_multiplier)
+    # Need safety_multiplier * (chunk_png_bytes + window_bytes) <= shm_avail;
+    # upscaled PNGs are assumed to grow with the pixel count
+    window_bytes = 0
+    if window_frames > 0:
+        window_bytes = avg_frame * scale**2 * window_frames * (2 + 2)
+    allowed_bytes_per_chunk = math.floor(shm_avail / safety_multiplier - window_bytes)
     if allowed_bytes_per_chunk <= 0:
         raise RuntimeError(
             f"Available space on {shm_path} ({_human(shm_avail)}) is too small "
-            f"for safety multiplier {safety_multiplier}."
+            f"for safety multiplier {safety_multiplier}"
+            + (f" and {window_frames}-frame windows." if window_frames else ".")
         )
-
-    avg_frame = est["avg_frame_size_bytes"]
     total_frames = max(1, est["total_frames"])  # avoid div-by-zero later
     fps = est["fps"] or 0.0
     duration = est["duration_seconds"] or 0.0
@@ -251,9 +264,12 @@ def plan_chunks_for_shm(
         "avg_frame_size_human": _human(avg_frame),
         "estimated_total_bytes": est["estimated_total_bytes"],
         "estimated_total_human": est["estimated_total_human"],
+        "window_bytes": window_bytes,
         "allowed_bytes_per_chunk": allowed_bytes_per_chunk,
         "allowed_bytes_per_chunk_human": _human(allowed_bytes_per_chunk),
         "total_frames": total_frames,
+        "width": est["width"],
+        "height": est["height"],
         "fps": fps,
         "duration_seconds": duration,
         "frames_per_chunk": int(frames_per_chunk),
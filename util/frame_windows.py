@@ -0,0 +1,41 @@
+"""
+Rolling frame windows with eager deletion.
+
+Frames are processed window by window. Each file is deleted as soon as every
+stage that reads it has acknowledged it, so tmpfs only holds a few windows
+at a time instead of whole folders.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+def plan_windows(frame_count: int, window: int) -> List[Tuple[int, int]]:
+    """[(start, end)) frame index ranges of at most `window` frames."""
+    window = max(1, window)
+    return [(s, min(s + window, frame_count)) for s in range(0, frame_count, window)]
+
+
+class FrameRefs:
+    """Reference counts for files read by several consumers; unlinked at zero."""
+
+    def __init__(self):
+        self.counts: Dict[Path, int] = {}
+
+    def add(self, path, consumers: int = 1):
+        path = Path(path)
+        self.counts[path] = self.counts.get(path, 0) + consumers
+
+    def release(self, path) -> bool:
+        """Acknowledge one use of `path`; returns True if it was deleted."""
+        path = Path(path)
+        remaining = self.counts.get(path, 0) - 1
+        if remaining > 0:
+            self.counts[path] = remaining
+            return False
+        self.counts.pop(path, None)
+        path.unlink(missing_ok=True)
+        return True
+
+    def __len__(self):
+        return len(self.counts)
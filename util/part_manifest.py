@@ -0,0 +1,118 @@
+"""
+Frame-accurate split manifests and cheap validation of processed parts.
+
+The manifest records, per part, the source frame range, the expected output
+frame count and checksums. Parts are validated with ffprobe packet counts
+(no decoding), so only parts that fail need to be processed again.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def sha256_file(path: str, chunk_size: int = 4 * 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def count_video_packets(path: str) -> int:
+    """Number of video packets (= frames) in the first video stream, no decode."""
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-count_packets",
+            "-show_entries",
+            "stream=nb_read_packets",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            str(path),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return int(result.stdout.strip().splitlines()[0])
+
+
+def probe_duration(path: str) -> float:
+    """Duration of the first video stream (the container's includes audio)."""
+    result = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=duration",
+            "-of",
+            "default=noprint_wrappers=1:nokey=1",
+            str(path),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[0])
+
+
+def frame_ranges(total_frames: int, pieces: int) -> List[Tuple[int, int]]:
+    """Split [0, total_frames) into `pieces` contiguous [start, end) ranges."""
+    pieces = max(1, min(pieces, total_frames))
+    bounds = [round(i * total_frames / pieces) for i in range(pieces + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def source_identity(path: str) -> Dict[str, Any]:
+    """Cheap identity of the source file, to tell if a manifest still applies."""
+    st = os.stat(path)
+    return {"path": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def load_manifest(path: str) -> Optional[Dict[str, Any]]:
+    if Path(path).exists():
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def save_manifest(path: str, manifest: Dict[str, Any]):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def validate_part(
+    output_path: str, entry: Dict[str, Any], duration_tolerance: float = 0.5
+) -> Tuple[bool, str]:
+    """
+    Check a processed part against its manifest entry: video packet count must
+    equal expected_output_frames and duration must be within tolerance.
+    Returns (ok, reason).
+    """
+    if not Path(output_path).is_file() or Path(output_path).stat().st_size == 0:
+        return False, "missing"
+    try:
+        frames = count_video_packets(output_path)
+        duration = probe_duration(output_path)
+    except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+        return False, f"unreadable ({e})"
+    if frames != entry["expected_output_frames"]:
+        return False, f"{frames} frames, expected {entry['expected_output_frames']}"
+    if abs(duration - entry["expected_seconds"]) > duration_tolerance:
+        return False, f"{duration:.2f}s, expected {entry['expected_seconds']:.2f}s"
+    return True, "ok"
@@ -0,0 +1,152 @@
+"""
+Changed-region upscaling for mostly static cartoon frames.
+
+Each source frame is compared in fixed tiles against a reference frame (the
+source pixels that were last sent to the upscaler). Only tiles that changed
+are cropped, with padding for the model's receptive field, and upscaled; the
+results are pasted onto the previous upscaled frame. A full frame is upscaled
+at scene cuts and every `refresh_interval` frames.
+
+Needs numpy and Pillow.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+def load_rgb(path) -> np.ndarray:
+    with Image.open(path) as im:
+        return np.asarray(im.convert("RGB"))
+
+
+def save_rgb(array: np.ndarray, path):
+    # Frames are temporary, favour speed over size
+    Image.fromarray(array).save(path, compress_level=1)
+
+
+def changed_tiles(
+    reference: np.ndarray, frame: np.ndarray, tile: int, threshold: int
+) -> np.ndarray:
+    """
+    Boolean (rows, cols) grid, True where any pixel of the tile differs from
+    the reference by more than `threshold` in any channel.
+    """
+    diff = np.abs(frame.astype(np.int16) - reference.astype(np.int16)).max(axis=2)
+    changed = diff > threshold
+    h, w = changed.shape
+    rows, cols = -(-h // tile), -(-w // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:h, :w] = changed
+    return padded.reshape(rows, tile, cols, tile).any(axis=(1, 3))
+
+
+def tile_boxes(
+    row: int, col: int, tile: int, shape: Tuple[int, ...], pad: int
+) -> Tuple[Tuple[int, int, int, int], Tuple[int, int, int, int]]:
+    """Return (tile box, padded crop box) as (y0, x0, y1, x1) clipped to the frame."""
+    h, w = shape[:2]
+    y0, x0 = row * tile, col * tile
+    y1, x1 = min(y0 + tile, h), min(x0 + tile, w)
+    crop = (max(0, y0 - pad), max(0, x0 - pad), min(h, y1 + pad), min(w, x1 + pad))
+    return (y0, x0, y1, x1), crop
+
+
+def plan_regions(
+    frame_paths: List[Path],
+    crops_dir: Path,
+    tile: int = 64,
+    pad: int = 16,
+    threshold: int = 6,
+    refresh_interval: int = 50,
+    scene_cut_fraction: float = 0.5,
+) -> List[Dict[str, Any]]:
+    """
+    Write the images that need upscaling into `crops_dir` and return the plan:
+    one entry per frame with "frame" (file name), "full" (whole frame written)
+    and "tiles" ([{"crop_file", "box", "crop"}] in source pixels).
+    """
+    crops_dir = Path(crops_dir)
+    crops_dir.mkdir(parents=True, exist_ok=True)
+    plan = []
+    reference = None
+    since_refresh = 0
+
+    for path in frame_paths:
+        path = Path(path)
+        frame = load_rgb(path)
+        mask = None
+        if (
+            reference is not None
+            and reference.shape == frame.shape
+            and since_refresh < refresh_interval
+        ):
+            mask = changed_tiles(reference, frame, tile, threshold)
+            if mask.mean() > scene_cut_fraction:
+                mask = None  # scene cut, refresh everything
+
+        if mask is None:
+            shutil.copyfile(path, crops_dir / f"{path.stem}.png")
+            reference = frame.copy()
+            since_refresh = 1  # the full frame counts towards the interval
+            plan.append({"frame": path.name, "full": True, "tiles": []})
+            continue
+
+        tiles = []
+        for row, col in zip(*np.nonzero(mask)):
+            box, crop = tile_boxes(int(row), int(col), tile, frame.shape, pad)
+            crop_file = f"{path.stem}_t{row:03d}_{col:03d}.png"
+            save_rgb(frame[crop[0] : crop[2], crop[1] : crop[3]], crops_dir / crop_file)
+            reference[box[0] : box[2], box[1] : box[3]] = frame[
+                box[0] : box[2], box[1] : box[3]
+            ]
+            tiles.append({"crop_file": crop_file, "box": box, "crop": crop})
+        since_refresh += 1
+        plan.append({"frame": path.name, "full": False, "tiles": tiles})
+
+    return plan
+
+
+def composite_regions(
+    plan: List[Dict[str, Any]], upscaled_dir: Path, output_dir: Path, scale: int
+) -> Dict[str, int]:
+    """
+    Build the upscaled frames in `output_dir` from the upscaled crops of `plan`.
+    Frames without changed tiles are hard-linked to the previous output.
+    """
+    upscaled_dir, output_dir = Path(upscaled_dir), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stats = {"frames": 0, "full": 0, "tiles": 0, "unchanged": 0}
+    current = None
+    previous_path = None
+
+    for entry in plan:
+        out_path = output_dir / entry["frame"]
+        stats["frames"] += 1
+        if entry["full"]:
+            current = load_rgb(upscaled_dir / f"{Path(entry['frame']).stem}.png").copy()
+            stats["full"] += 1
+        elif not entry["tiles"]:
+            stats["unchanged"] += 1
+            out_path.unlink(missing_ok=True)
+            os.link(previous_path, out_path)
+            previous_path = out_path
+            continue
+        else:
+            for t in entry["tiles"]:
+                up = load_rgb(upscaled_dir / t["crop_file"])
+                y0, x0, y1, x1 = t["box"]
+                cy, cx = t["crop"][0], t["crop"][1]
+                current[y0 * scale : y1 * scale, x0 * scale : x1 * scale] = up[
+                    (y0 - cy) * scale : (y1 - cy) * scale,
+                    (x0 - cx) * scale : (x1 - cx) * scale,
+                ]
+            stats["tiles"] += len(entry["tiles"])
+        save_rgb(current, out_path)
+        previous_path = out_path
+
+    return stats
@@ -0,0 +1,176 @@
+"""
+Per-stage CPU affinity, niceness and I/O priority for external processes,
+plus per-stage CPU usage accounting.
+
+A stage policy looks like:
+    {"cpus": "0-3,8-11", "nice": 10, "ionice": 2, "ionice_level": 7}
+Every key is optional. The policy is applied by prefixing the command with
+taskset / nice / ionice, so it is inherited by everything the command starts
+(e.g. ffmpeg under a bash script) and is safe to use from threads.
+
+CPU usage of each run (including its children) is taken from wait4() and
+appended to a JSON lines log. Summarize it with:
+    python util/resource_governor.py resource_usage.jsonl
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Dict, Any, Optional, Set
+
+
+def parse_cpus(spec) -> Set[int]:
+    """'0-3,8' or [0, 1, 2] → {0, 1, 2, 3, 8}"""
+    if isinstance(spec, (list, tuple, set)):
+        return {int(c) for c in spec}
+    cpus = set()
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.update(range(int(lo), int(hi) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def allowed_cpus(policy: Optional[Dict[str, Any]]) -> Set[int]:
+    """Policy CPUs that exist on this machine (all available CPUs if unset)."""
+    available = os.sched_getaffinity(0)
+    if not policy or policy.get("cpus") is None:
+        return set(available)
+    return parse_cpus(policy["cpus"]) & available or set(available)
+
+
+def governed_command(cmd, policy: Optional[Dict[str, Any]], shell: bool = False):
+    """Return the argv list that runs `cmd` under `policy`."""
+    if shell:
+        cmd = ["sh", "-c", cmd]
+    if not policy:
+        return list(cmd)
+
+    prefix = []
+    if policy.get("cpus") is not None and shutil.which("taskset"):
+        cpus = ",".join(str(c) for c in sorted(allowed_cpus(policy)))
+        prefix += ["taskset", "-c", cpus]
+    if policy.get("nice") and shutil.which("nice"):
+        prefix += ["nice", "-n", str(policy["nice"])]
+    if policy.get("ionice") is not None and shutil.which("ionice"):
+        prefix += ["ionice", "-c", str(policy["ionice"])]
+        if policy["ionice"] in (1, 2) and policy.get("ionice_level") is not None:
+            prefix += ["-n", str(policy["ionice_level"])]
+    return prefix + list(cmd)
+
+
+def start_governed(
+    cmd,
+    stage: Optional[str],
+    policies: Optional[Dict[str, Dict[str, Any]]] = None,
+    shell: bool = False,
+    **popen_kwargs,
+) -> subprocess.Popen:
+    """Start `cmd` with the policy of `stage`; finish it with wait_governed()."""
+    policy = (policies or {}).get(stage) if stage else None
+    proc = subprocess.Popen(governed_command(cmd, policy, shell), **popen_kwargs)
+    proc.stage = stage
+    proc.policy = policy
+    proc.started_at = time.time()
+    return proc
+
+
+def wait_governed(
+    proc: subprocess.Popen, usage_log: Optional[str] = None, name: str = ""
+) -> Dict[str, Any]:
+    """
+    Wait for a process from start_governed() (check=True semantics) and return
+    its CPU usage. Usage is appended to `usage_log` when given and stage is known.
+    """
+    try:
+        _, status, ru = os.wait4(proc.pid, 0)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.time() - proc.started_at
+
+    cpu_seconds = ru.ru_utime + ru.ru_stime
+    usage = {
+        "recorded_at": proc.started_at,
+        "name": name,
+        "stage": proc.stage,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu_seconds,
+        "avg_cores": cpu_seconds / wall if wall > 0 else 0.0,
+        "allowed_cpus": len(allowed_cpus(proc.policy)),
+        "involuntary_switches": ru.ru_nivcsw,
+        "returncode": proc.returncode,
+    }
+    if proc.stage and usage_log:
+        with open(usage_log, "a") as f:
+            f.write(json.dumps(usage) + "\n")
+
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args)
+    return usage
+
+
+def run_governed(
+    cmd,
+    stage: Optional[str],
+    policies: Optional[Dict[str, Dict[str, Any]]] = None,
+    usage_log: Optional[str] = None,
+    shell: bool = False,
+    name: str = "",
+    **popen_kwargs,
+) -> Dict[str, Any]:
+    """Run `cmd` to completion under the policy of `stage`, see wait_governed()."""
+    proc = start_governed(cmd, stage, policies, shell, **popen_kwargs)
+    return wait_governed(proc, usage_log, name)
+
+
+def summarize_usage(usage_log: str) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregate the log per stage: runs, wall and CPU seconds, average cores used
+    and involuntary context switches per CPU second. A GPU feeder stage with
+    high switches/CPU-s and few cores used is being starved by other stages.
+    """
+    stages = {}
+    with open(usage_log) as f:
+        for line in f:
+            u = json.loads(line)
+            s = stages.setdefault(
+                u["stage"],
+                {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "switches": 0},
+            )
+            s["runs"] += 1
+            s["wall_seconds"] += u["wall_seconds"]
+            s["cpu_seconds"] += u["cpu_seconds"]
+            s["switches"] += u["involuntary_switches"]
+    for s in stages.values():
+        s["avg_cores"] = s["cpu_seconds"] / s["wall_seconds"] if s["wall_seconds"] else 0
+        s["switches_per_cpu_second"] = (
+            s["switches"] / s["cpu_seconds"] if s["cpu_seconds"] else 0
+        )
+    return stages
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <resource_usage.jsonl>")
+        sys.exit(1)
+    print(
+        f"{'stage':<12} {'runs':>5} {'wall s':>10} {'cpu s':>10} "
+        f"{'cores':>6} {'invcsw/cpu-s':>13}"
+    )
+    for stage, s in sorted(summarize_usage(sys.argv[1]).items()):
+        print(
+            f"{stage:<12} {s['runs']:>5} {s['wall_seconds']:>10.1f} "
+            f"{s['cpu_seconds']:>10.1f} {s['avg_cores']:>6.2f} "
+            f"{s['switches_per_cpu_second']:>13.1f}"
+        )
@@ -0,0 +1,169 @@
+"""
+Historical throughput database (sqlite) for ETA prediction and part sizing.
+
+Each pipeline run records frames/sec per stage, GPU, model, scale, source
+resolution, upscale mode and configured backends. The batched pipeline uses
+the history to predict wall time, pick a piece count that balances finishing
+time across GPUs, and flag runs that are slower than their baseline.
+"""
+
+import heapq
+import json
+import sqlite3
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS throughput (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL,
+    name TEXT,
+    stage TEXT,
+    gpu TEXT,
+    model TEXT,
+    scale INTEGER,
+    width INTEGER,
+    height INTEGER,
+    mode TEXT,
+    backends TEXT,
+    frames INTEGER,
+    seconds REAL,
+    fps REAL
+)
+"""
+
+
+def model_key(waifu_model: str, rife_model: str) -> str:
+    """Model name used for whole-pipeline ("total") measurements."""
+    return f"{waifu_model}+{rife_model}"
+
+
+def setup_mode(upscale_mode: str, window_frames: int) -> str:
+    """Processing mode part of the key, e.g. "changed_regions+window500"."""
+    return f"{upscale_mode}+window{window_frames or 0}"
+
+
+def backend_signature(upscale_backends, interpolate_backend) -> str:
+    """Stable string for the configured backends, e.g. CPU-assisted upscaling."""
+    return json.dumps(
+        {"upscale": upscale_backends, "interpolate": interpolate_backend},
+        sort_keys=True,
+    )
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)  # parallel parts write too
+    conn.execute(SCHEMA)
+    # Databases from before mode/backends were recorded; their rows keep
+    # NULL there and never match a baseline query
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(throughput)")}
+    for column in ("mode", "backends"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE throughput ADD COLUMN {column} TEXT")
+    return conn
+
+
+def record(
+    db_path: str,
+    stage: str,
+    gpu,
+    model: str,
+    scale: int,
+    size: Tuple[int, int],
+    mode: str,
+    backends: str,
+    frames: int,
+    seconds: float,
+    name: str = "",
+) -> float:
+    """Store one measurement and return its frames/sec."""
+    fps = frames / seconds if seconds > 0 else 0.0
+    with _connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO throughput (recorded_at, name, stage, gpu, model, scale, "
+            "width, height, mode, backends, frames, seconds, fps) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (
+                time.time(),
+                name,
+                stage,
+                str(gpu),
+                model,
+                int(scale),
+                *size,
+                mode,
+                backends,
+                frames,
+                seconds,
+                fps,
+            ),
+        )
+    conn.close()
+    return fps
+
+
+def baseline_fps(
+    db_path: str,
+    stage: str,
+    gpu,
+    model: str,
+    scale: int,
+    size: Tuple[int, int],
+    mode: str,
+    backends: str,
+    last_runs: int = 10,
+) -> Optional[float]:
+    """Median fps of the last `last_runs` matching runs, None without history."""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT fps FROM throughput WHERE stage=? AND gpu=? AND model=? "
+            "AND scale=? AND width=? AND height=? AND mode=? AND backends=? "
+            "AND fps > 0 ORDER BY recorded_at DESC LIMIT ?",
+            (stage, str(gpu), model, int(scale), *size, mode, backends, last_runs),
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return None
+    return statistics.median(r[0] for r in rows)
+
+
+def simulate_makespan(
+    total_frames: int, pieces: int, fps_by_gpu: List[float], overhead_seconds: float
+) -> float:
+    """
+    Wall time when `pieces` equal parts are handed to whichever GPU frees up
+    first (what batched_pipeline does), each part paying a fixed overhead.
+    """
+    frames_per_piece = total_frames / pieces
+    free_at = [(0.0, i) for i in range(len(fps_by_gpu))]
+    heapq.heapify(free_at)
+    finish = 0.0
+    for _ in range(pieces):
+        t, gpu = heapq.heappop(free_at)
+        t += frames_per_piece / fps_by_gpu[gpu] + overhead_seconds
+        finish = max(finish, t)
+        heapq.heappush(free_at, (t, gpu))
+    return finish
+
+
+def choose_pieces(
+    total_frames: int,
+    fps_by_gpu: List[float],
+    min_pieces: int,
+    overhead_seconds: float,
+    max_pieces: Optional[int] = None,
+) -> Tuple[int, float]:
+    """
+    Piece count (>= min_pieces, which keeps parts fitting in shm) with the
+    shortest predicted wall time. Returns (pieces, predicted seconds).
+    """
+    max_pieces = max_pieces or max(min_pieces, min_pieces * 4)
+    best = None
+    for pieces in range(min_pieces, max_pieces + 1):
+        makespan = simulate_makespan(total_frames, pieces, fps_by_gpu, overhead_seconds)
+        if best is None or makespan < best[1] - 1e-9:
+            best = (pieces, makespan)
+    return best
@@ -0,0 +1,59 @@
+"""
+Tuned tile size / thread count profile for waifu2x and RIFE.
+
+Profile is a JSON file keyed by "gpu<id>|<tool>|<model>|<width>x<height>",
+written by tune_pipeline.py and read by upscale_pipeline.py.
+"""
+
+import json
+import struct
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def png_size(png_path: str) -> Tuple[int, int]:
+    """Return (width, height) from the PNG IHDR chunk without decoding the image."""
+    with open(png_path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        raise ValueError(f"Not a PNG file: {png_path}")
+    return struct.unpack(">II", header[16:24])
+
+
+def profile_key(gpu, tool: str, model: str, size: Tuple[int, int]) -> str:
+    return f"gpu{gpu}|{tool}|{Path(model).name}|{size[0]}x{size[1]}"
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    if Path(path).exists():
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_profile(path: str, profile: Dict[str, Any]):
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2, sort_keys=True)
+
+
+def lookup(
+    profile: Dict[str, Any], gpu, tool: str, model: str, size: Tuple[int, int]
+) -> Optional[Dict[str, Any]]:
+    return profile.get(profile_key(gpu, tool, model, size))
+
+
+def choose_best(trials: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Pick the fastest successful trial.
+    Each trial is {"threads", "tile", "seconds", "frames", "ok"}; returns the
+    winner with an added "fps" field, or None if every trial failed.
+    """
+    ok = [t for t in trials if t.get("ok") and t["seconds"] > 0]
+    if not ok:
+        return None
+    best = min(ok, key=lambda t: t["seconds"])
+    return {
+        "threads": best["threads"],
+        "tile": best["tile"],
+        "fps": best["frames"] / best["seconds"],
+    }